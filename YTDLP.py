@@ -1,105 +1,104 @@
-import threading
-import queue
 import time
 import os
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
+
+from functions import download_key
+from jobs import (
+    DownloadJob, JobRegistry, JobRunner, job_registry,
+    QUEUED, DOWNLOADING, PROCESSING,
+)
 
 # === CONFIGURATION ===
 DOWNLOAD_DIR = "downloads"
+DEFAULT_WORKERS = 3
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-class YTDLPDownloader:
-    def __init__(self):
-        self.download_queue = queue.Queue()
-        self.current_progress = "All downloads complete"
-        self.lock = threading.Lock()
-        self.worker_thread = threading.Thread(target=self._worker, daemon=True)
-        self.worker_thread.start()
-
-    def _progress_hook(self, d):
-        if d['status'] == 'downloading':
-            percent = d.get('_percent_str', '0%').strip()
-            speed = d.get('_speed_str', '0 B/s').strip()
-            eta = d.get('_eta_str', '--:--').strip()
-            total = d.get('_total_bytes_str', '?').strip()
-
-            with self.lock:
-                self.current_progress = (
-                    # LOG OUT THE DETAILS
-                    
-                    f"{percent} | Speed: {speed} | ETA: {eta} | Size: {total}"
+class YTDLPDownloader(JobRunner):
+    source = "youtube"
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, registry: JobRegistry = job_registry):
+        super().__init__(workers, registry)
+
+    def _progress_hook(self, job: DownloadJob):
+        def hook(d):
+            if job.cancelled:
+                raise DownloadCancelled(f"Cancelled: {job.url}")
+
+            if d['status'] == 'downloading':
+                # _worker already set DOWNLOADING; only filename and total_bytes can change here
+                self.registry.update(
+                    job.id,
+                    downloaded_bytes=d.get('downloaded_bytes') or 0,
+                    total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                    speed=d.get('speed'),
+                    eta=d.get('eta'),
+                    filename=d.get('filename'),
                 )
-        elif d['status'] == 'finished':
-            with self.lock:
-                self.current_progress = "All downloads complete"
-
-    def _worker(self):
-        while True:
-            url = self.download_queue.get()
-            if url is None:
-                break
-
-            print(f"\n=== Starting download: {url} ===")
-            with self.lock:
-                self.current_progress = "Starting..."
-
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': os.path.join(DOWNLOAD_DIR, '%(title)s.%(ext)s'),
-                'progress_hooks': [self._progress_hook],
-                'quiet': True,
-                'noplaylist': True,
-                'nooverwrites': False,
-                'retries': 1,
-                'force_overwrites': True,
-                'ignoreerrors': True,
-                'continuedl': False,
-                'writethumbnail': True,
-                'postprocessors': [
-                    {
-                        # Convert to mp3
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '0',
-                    },
-                    {
-                        # Embed the thumbnail as album art
-                        'key': 'EmbedThumbnail',
-                        'already_have_thumbnail': False,
-                    },
-                    {
-                        # Add basic metadata
-                        'key': 'FFmpegMetadata',
-                    }
-                ],
-                'prefer_ffmpeg': True,
-                'verbose': False
-            }
-
-            try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-            except Exception as e:
-                print(f"⚠️ Error downloading {url}: {e}")
-                with self.lock:
-                    self.current_progress = f"Download failed: {url}"
-
-            self.download_queue.task_done()
-
-    def add_to_queue(self, url: str):
-        self.download_queue.put(url)
-        print(f"➕ Added to queue: {url}")
+            elif d['status'] == 'finished':
+                # Download done, postprocessors (mp3 conversion, thumbnail) still to run
+                self.registry.update(job.id, state=PROCESSING, speed=None, eta=0)
+        return hook
+
+    def _ydl_opts(self, job: DownloadJob) -> dict:
+        return {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(DOWNLOAD_DIR, '%(title)s.%(ext)s'),
+            'progress_hooks': [self._progress_hook(job)],
+            'quiet': True,
+            'noplaylist': True,
+            'nooverwrites': False,
+            # Resume interrupted downloads from their .part file
+            'continuedl': True,
+            'retries': 10,
+            'fragment_retries': 10,
+            'retry_sleep_functions': {
+                'http': lambda n: min(2 ** n, 60),
+                'fragment': lambda n: min(2 ** n, 60),
+            },
+            'ignoreerrors': False,
+            'writethumbnail': True,
+            'postprocessors': [
+                {
+                    # Convert to mp3
+                    'key': 'FFmpegExtractAudio',
+                    'preferredcodec': 'mp3',
+                    'preferredquality': '0',
+                },
+                {
+                    # Embed the thumbnail as album art
+                    'key': 'EmbedThumbnail',
+                    'already_have_thumbnail': False,
+                },
+                {
+                    # Add basic metadata
+                    'key': 'FFmpegMetadata',
+                }
+            ],
+            'prefer_ffmpeg': True,
+            'verbose': False
+        }
+
+    def run(self, job: DownloadJob) -> dict:
+        with YoutubeDL(self._ydl_opts(job)) as ydl:
+            info = ydl.extract_info(job.url, download=True)
+        # Path of the final file, after mp3 conversion
+        downloads = (info or {}).get('requested_downloads') or [{}]
+        return {'filename': downloads[0].get('filepath') or job.filename}
+
+    def add_to_queue(self, url: str) -> tuple[DownloadJob, bool]:
+        return self.enqueue(url, media_key=download_key(url))
 
     def get_current_progress(self):
-        with self.lock:
-            return self.current_progress
-
-    def wait_until_done(self):
-        self.download_queue.join()
-
-    def stop(self):
-        self.download_queue.put(None)
-        self.worker_thread.join()
+        """Human readable summary of the active jobs."""
+        active = [j for j in self.registry.list() if j.source == "youtube" and j.state in (QUEUED, DOWNLOADING, PROCESSING)]
+        if not active:
+            return "All downloads complete"
+        parts = []
+        for job in active:
+            percent = job.to_dict()["percent"]
+            parts.append(f"{job.id}: {job.state}" + (f" {percent}%" if percent is not None else ""))
+        return " | ".join(parts)
 
 # === Example Usage ===
 if __name__ == "__main__":
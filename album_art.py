@@ -0,0 +1,216 @@
+"""
+Content-addressed album art cache.
+
+Art URLs map to the SHA-256 of the image bytes; images are stored once per
+hash on disk and kept in a size-bounded memory LRU. The disk cache is capped
+too: once it outgrows DISK_BYTES the oldest files are pruned, and the URL
+lookup table is a bounded LRU as well. The hash doubles as a
+strong ETag, so remotes polling /album_art mostly get 304s. Resized variants
+for small screens are generated with Pillow when it is installed.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse, unquote
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # resizing is optional
+    Image = None
+
+MEMORY_BYTES = 32 * 1024 * 1024
+DISK_BYTES = 256 * 1024 * 1024
+DISK_PRUNE_TO = 0.9  # prune down to this fraction of DISK_BYTES, so it doesn't run on every store
+URL_ENTRIES = 1024
+FETCH_TIMEOUT = 5  # seconds
+
+
+class ArtUnavailable(Exception):
+    """The art URL could not be read or fetched."""
+
+
+class AlbumArtCache:
+    def __init__(self, cache_dir: str, memory_bytes: int = MEMORY_BYTES, disk_bytes: int = DISK_BYTES):
+        self.blob_dir = Path(cache_dir) / "blobs"
+        self.index_dir = Path(cache_dir) / "index"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_bytes = memory_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used = 0
+        self._urls: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self.disk_bytes = disk_bytes
+        self._disk_lock = threading.Lock()
+        self._disk_used = sum(size for _, size, _ in self._disk_files())
+        self._prune_disk()
+
+    # ------------------------------ storage ------------------------------ #
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _load_blob(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        path = self.blob_dir / key
+        if not path.exists():
+            return None
+        data = path.read_bytes()
+        self._remember(key, data)
+        return data
+
+    def _store_blob(self, key: str, data: bytes):
+        path = self.blob_dir / key
+        if not path.exists():
+            # Concurrent stores of the same blob each write their own temp file; the
+            # link only succeeds for the first, and the rest find identical content there
+            fd, tmp = tempfile.mkstemp(dir=self.blob_dir, prefix=f".{key}.")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.link(tmp, path)
+                self._track_disk(len(data))
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+        self._remember(key, data)
+
+    def _disk_files(self) -> list[tuple[Path, int, float]]:
+        """(path, size, mtime) of every blob and index file."""
+        files = []
+        for directory in (self.blob_dir, self.index_dir):
+            for entry in os.scandir(directory):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((Path(entry.path), st.st_size, st.st_mtime))
+        return files
+
+    def _track_disk(self, size: int):
+        with self._disk_lock:
+            self._disk_used += size
+        if self._disk_used > self.disk_bytes:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the oldest files until the disk cache is back under its cap."""
+        with self._disk_lock:
+            if self._disk_used <= self.disk_bytes:
+                return
+            files = sorted(self._disk_files(), key=lambda f: f[2])
+            used = sum(size for _, size, _ in files)
+            removed = 0
+            for path, size, _ in files:
+                if used <= self.disk_bytes * DISK_PRUNE_TO:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                used -= size
+                removed += 1
+            self._disk_used = used
+        # Index entries whose blob was pruned are refetched by _original on their next use
+        print(f"🧹 Album art cache pruned: {removed} files removed")
+
+    # ------------------------------ lookup ------------------------------ #
+
+    def _url_key(self, art_url: str) -> str:
+        """Local files also key on size/mtime, so replaced art isn't served stale."""
+        key = art_url
+        if art_url.startswith("file://"):
+            try:
+                st = Path(unquote(urlparse(art_url).path)).stat()
+                key += f"|{st.st_size}|{st.st_mtime_ns}"
+            except OSError:
+                pass
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _fetch(self, art_url: str) -> tuple[bytes, str]:
+        if art_url.startswith("file://"):
+            local_path = Path(unquote(urlparse(art_url).path))
+            if not local_path.exists():
+                raise ArtUnavailable("File not found at local path")
+            mime = "image/png" if local_path.suffix.lower() == ".png" else "image/jpeg"
+            return local_path.read_bytes(), mime
+        if art_url.startswith("http"):
+            print(f"Downloading remote image from: {art_url}")
+            response = self._session.get(art_url, timeout=FETCH_TIMEOUT)
+            if response.status_code != 200:
+                raise ArtUnavailable(f"HTTP request failed with status: {response.status_code}")
+            return response.content, response.headers.get("Content-Type", "image/jpeg")
+        raise ArtUnavailable(f"Unrecognized art URL format: {art_url}")
+
+    def _original(self, art_url: str) -> tuple[str, str]:
+        """Return (content hash, mime) for the art URL, fetching it on a miss."""
+        url_key = self._url_key(art_url)
+        entry = self._urls.get(url_key)
+        if entry is None:
+            index_path = self.index_dir / f"{url_key}.json"
+            if index_path.exists():
+                entry = json.loads(index_path.read_text())
+        if entry is not None and self._load_blob(entry["hash"]) is not None:
+            self._remember_url(url_key, entry)
+            return entry["hash"], entry["mime"]
+
+        data, mime = self._fetch(art_url)
+        content_hash = hashlib.sha256(data).hexdigest()
+        self._store_blob(content_hash, data)
+        entry = {"hash": content_hash, "mime": mime}
+        index_data = json.dumps(entry)
+        (self.index_dir / f"{url_key}.json").write_text(index_data)
+        self._track_disk(len(index_data))
+        self._remember_url(url_key, entry)
+        return content_hash, mime
+
+    def _remember_url(self, url_key: str, entry: dict):
+        with self._lock:
+            self._urls[url_key] = entry
+            self._urls.move_to_end(url_key)
+            while len(self._urls) > URL_ENTRIES:
+                self._urls.popitem(last=False)
+
+    def get(self, art_url: str, size: Optional[int] = None) -> tuple[bytes, str, str]:
+        """
+        Return (image bytes, mime type, etag) for the art URL, optionally resized
+        to fit within `size` x `size`. Raises ArtUnavailable.
+        """
+        content_hash, mime = self._original(art_url)
+        if size is None or Image is None:
+            return self._load_blob(content_hash), mime, content_hash
+
+        variant = f"{content_hash}-{size}"
+        data = self._load_blob(variant)
+        if data is None:
+            with Image.open(io.BytesIO(self._load_blob(content_hash))) as image:
+                image = image.convert("RGB")
+                image.thumbnail((size, size))
+                out = io.BytesIO()
+                image.save(out, format="JPEG", quality=85)
+            data = out.getvalue()
+            self._store_blob(variant, data)
+        return data, "image/jpeg", variant
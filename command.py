@@ -1,31 +1,34 @@
 """
-This file handles the commands that will be run by subprocess
+This file handles the commands that will be run by subprocess.
+They run as asyncio subprocesses, so awaiting them never blocks the event loop.
 """
 
-import subprocess
+import asyncio
+import shlex
 from typing import Optional
 
+from concurrency import run_command, CommandError
+
 IGNORE_PLAYERS = "Gwenview,firefox,GSConnect"
 
 
 
-def open_sp_client(track_id):
+async def open_sp_client(track_id):
     xdg_uri = f"spotify:track:{track_id}"
     try:
-        subprocess.run(["xdg-open", xdg_uri], check=True)
+        await run_command(["xdg-open", xdg_uri], capture=False)
         print("Spotify track opened successfully.")
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print("Failed to open Spotify track:", e)
     except FileNotFoundError:
         print("xdg-open not found. Make sure you're on a Linux system with xdg-utils installed.")
 
-def control_playerctl(command, player: Optional[str] = "active"):
-    import shlex
+async def control_playerctl(command, player: Optional[str] = "active"):
     try:
         args = ["playerctl", f"--player={player}",f"--ignore-player={IGNORE_PLAYERS}"] + shlex.split(command)
-        subprocess.run(args, check=True)
+        await run_command(args, capture=False)
         print(f"Executed: {' '.join(args)}")
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print(f"Command failed: {e}")
     except FileNotFoundError:
         print("playerctl not found. Please install it first.")
@@ -34,4 +37,4 @@ if __name__ == "__main__":
     
     # Spotify track URI
     track_id = "0FQhID3J9Hqul3X0jf9nnW"
-    open_sp_client(track_id)
\ No newline at end of file
+    asyncio.run(open_sp_client(track_id))
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Per-backend concurrency limits for the async routes.
+
+The player and media routes run on the event loop. Blocking work (yt-dlp,
+the Spotify API, MPRIS over D-Bus, mpv IPC, album art fetches, library
+queries) goes to a small thread pool per backend, and external commands run
+as asyncio subprocesses under a per-command semaphore. A saturated backend
+only queues its own callers, so a burst of slow YouTube searches can't hold
+up a pause.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# Threads per blocking backend
+BACKEND_WORKERS = {
+    "player": 8,  # MPRIS reads (which may wait up to 0.5 s for a change), mpv IPC and startup
+    "ytdlp": 4,  # matches the extractor's own pool
+    "spotify": 4,
+    "art": 2,
+    "library": 4,
+}
+# Concurrent processes per external command
+COMMAND_LIMITS = {
+    "playerctl": 8,
+    "xdg-open": 1,
+}
+COMMAND_TIMEOUT = 10  # seconds
+
+_executors = {
+    name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-backend")
+    for name, workers in BACKEND_WORKERS.items()
+}
+_command_slots = {name: asyncio.Semaphore(limit) for name, limit in COMMAND_LIMITS.items()}
+
+
+class CommandError(Exception):
+    """An external command exited with a non-zero status or timed out."""
+
+
+async def run_blocking(backend: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run `fn(*args, **kwargs)` on the backend's thread pool and await the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors[backend], functools.partial(fn, *args, **kwargs))
+
+
+async def run_command(args: list[str], timeout: float = COMMAND_TIMEOUT, capture: bool = True) -> str:
+    """
+    Run an external command without blocking the event loop and return its
+    stripped stdout. Raises CommandError, or FileNotFoundError if the
+    executable is missing.
+
+    Pass `capture=False` for commands whose output isn't needed, especially
+    ones that launch other programs (xdg-open): a launched program inherits
+    the pipes, so waiting for their EOF would wait for it to exit.
+    """
+    stream = asyncio.subprocess.PIPE if capture else asyncio.subprocess.DEVNULL
+    async with _command_slots[args[0]]:
+        proc = await asyncio.create_subprocess_exec(*args, stdout=stream, stderr=stream)
+        try:
+            if capture:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            else:
+                stdout, stderr = b"", b""
+                await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise CommandError(f"{args[0]} timed out after {timeout}s")
+    if proc.returncode != 0:
+        raise CommandError(f"{' '.join(args)} exited with {proc.returncode}: {stderr.decode().strip()}")
+    return stdout.decode().strip()
+
+
+def shutdown():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
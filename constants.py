@@ -4,4 +4,8 @@ CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
 AUTH_PATH = os.path.join(os.path.dirname(__file__), "spotify_auth.yaml")
 SPOTIFY_DB_PATH = os.path.join(os.path.dirname(__file__), "spotify_liked_songs.db")
 SPOTIFY_SCOPES = "user-library-read user-read-playback-state user-modify-playback-state"
-LIKED_SONGS_DB_PATH = os.path.join(os.path.dirname(__file__), "liked_songs.db")
\ No newline at end of file
+LIKED_SONGS_DB_PATH = os.path.join(os.path.dirname(__file__), "liked_songs.db")
+METADATA_CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), "metadata_cache.db")
+LIBRARY_DB_PATH = os.path.join(os.path.dirname(__file__), "library.db")
+SEARCH_INDEX_DB_PATH = os.path.join(os.path.dirname(__file__), "search_index.db")
+DOWNLOAD_QUEUE_DB_PATH = os.path.join(os.path.dirname(__file__), "download_queue.db")
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Shared SQLite access for the liked-songs and Spotify databases.
+
+Each thread reuses its own connection instead of opening one per call. The
+databases run in WAL mode, so readers on the request threadpool never wait
+behind a sync that is writing. Schemas are versioned with PRAGMA
+user_version and migrated once at startup.
+"""
+
+import contextlib
+import sqlite3
+import threading
+from typing import Callable, Iterator, Union
+
+from constants import LIKED_SONGS_DB_PATH, SPOTIFY_DB_PATH
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # safe with WAL; only the last commits can be lost on power failure
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",  # 8 MB
+)
+
+# A migration is a SQL script or a function taking the connection
+Migration = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+class Database:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection, opened (and tuned) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes group themselves with transaction()
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block of writes atomically. Nested calls join the outer transaction."""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def migrate(self, migrations: list[Migration]):
+        """Apply the migrations after the schema's current user_version, in order."""
+        with self.transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(migrations[version:], start=version + 1):
+                if callable(migration):
+                    migration(conn)
+                else:
+                    for statement in migration.split(";"):
+                        if statement.strip():
+                            conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    def close(self):
+        """Close this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+liked_songs_db = Database(LIKED_SONGS_DB_PATH)
+spotify_db = Database(SPOTIFY_DB_PATH)
@@ -0,0 +1,102 @@
+"""
+In-process yt-dlp metadata extraction.
+
+Running extractions through the `yt_dlp` library on a small thread pool avoids
+paying interpreter startup and extractor import on every call, which is what
+shelling out to the `yt-dlp` binary costs.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError
+
+MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 60  # seconds, same budget the CLI calls used
+# A caller's timeout can't stop a call that is already running, so these bound how long a
+# stuck extraction keeps its worker: each network read gives up after SOCKET_TIMEOUT, and
+# failed extractor requests are retried at most EXTRACTOR_RETRIES times
+SOCKET_TIMEOUT = 15  # seconds
+EXTRACTOR_RETRIES = 1
+
+BASE_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "skip_download": True,
+    "noplaylist": True,
+    "socket_timeout": SOCKET_TIMEOUT,
+    "extractor_retries": EXTRACTOR_RETRIES,
+}
+
+
+class ExtractionError(Exception):
+    """Raised when yt-dlp cannot extract a URL or the call times out."""
+
+
+class YTDLPExtractor:
+    """
+    Bounded pool of warm yt-dlp workers.
+
+    `YoutubeDL` objects are not thread-safe, so each worker thread keeps its
+    own instances (one per option set) and reuses them across calls.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yt-dlp")
+        self._local = threading.local()
+
+    def _ydl(self, flat: bool) -> YoutubeDL:
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        if flat not in instances:
+            opts = dict(BASE_OPTS)
+            if flat:
+                opts["extract_flat"] = "in_playlist"
+                opts["noplaylist"] = False
+            instances[flat] = YoutubeDL(opts)
+        return instances[flat]
+
+    def _extract(self, url: str, flat: bool) -> dict:
+        ydl = self._ydl(flat)
+        try:
+            info = ydl.extract_info(url, download=False)
+        except DownloadError as e:
+            raise ExtractionError(str(e)) from e
+        if info is None:
+            raise ExtractionError(f"No data extracted for {url}")
+        # Same JSON-safe shape as `yt-dlp -j`
+        return ydl.sanitize_info(info)
+
+    def warm_up(self):
+        """Build a worker and its YoutubeDL so the first request doesn't pay for it."""
+        self._pool.submit(self._ydl, False)
+
+    def extract(self, url: str, flat: bool = False, timeout: Optional[float] = None) -> dict:
+        """
+        Return the info dict for `url`. With `flat=True`, playlists and searches
+        are not resolved per entry (like `--flat-playlist`).
+        """
+        future = self._pool.submit(self._extract, url, flat)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            # Only drops the call if it hasn't started yet; a running one keeps its worker
+            # until the socket timeout makes yt-dlp give up
+            future.cancel()
+            raise ExtractionError(f"yt-dlp extraction timed out for {url}")
+
+    def search(self, query: str, count: int, timeout: Optional[float] = None) -> list[dict]:
+        """Flat YouTube search returning up to `count` entries."""
+        info = self.extract(f"ytsearch{count}:{query}", flat=True, timeout=timeout)
+        return list(info.get("entries") or [])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared instance used by the player, the routes and the helpers
+ytdlp_extractor = YTDLPExtractor()
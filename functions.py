@@ -1,10 +1,6 @@
 import yaml
 import os
-import sqlite3
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-
-import subprocess
 
 import re
 
@@ -13,77 +9,155 @@ from constants import AUTH_PATH, CONFIG_PATH, SPOTIFY_DB_PATH, SPOTIFY_SCOPES
 import socket
 
 from constants import LIKED_SONGS_DB_PATH
+from extractor import ytdlp_extractor, ExtractionError
+from rate_limit import TokenBucket
+from spotify_client import SpotifyClientManager, SpotifyNotAuthenticated
+from settings import config_store, ConfigError
+from db import liked_songs_db, spotify_db
+from pagination import keyset_page
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
 from datetime import datetime
 
+LIKED_SONGS_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS liked_songs (
+        id TEXT PRIMARY KEY,
+        song_name TEXT,
+        artist TEXT,
+        url TEXT,
+        date_added TEXT,
+        type TEXT,
+        cover_art_url TEXT
+    )
+    """,
+    # Dedupe on (title, artist), case-insensitively, through a unique index
+    """
+    UPDATE liked_songs SET song_name = TRIM(song_name), artist = TRIM(COALESCE(artist, ''));
+    DELETE FROM liked_songs WHERE rowid NOT IN (
+        SELECT MIN(rowid) FROM liked_songs
+        GROUP BY song_name COLLATE NOCASE, artist COLLATE NOCASE
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_liked_songs_title_artist
+        ON liked_songs (song_name COLLATE NOCASE, artist COLLATE NOCASE)
+    """,
+    # Keyset pagination: one index per sort key, plus type-filtered listing
+    """
+    CREATE INDEX IF NOT EXISTS idx_liked_songs_added ON liked_songs (date_added, id);
+    CREATE INDEX IF NOT EXISTS idx_liked_songs_name ON liked_songs (song_name COLLATE NOCASE, id);
+    CREATE INDEX IF NOT EXISTS idx_liked_songs_artist ON liked_songs (artist COLLATE NOCASE, id);
+    CREATE INDEX IF NOT EXISTS idx_liked_songs_type ON liked_songs (type, date_added, id)
+    """,
+]
+
+# Sort keys for /liked_songs, each backed by an index above
+LIKED_SORT_EXPRESSIONS = {
+    "added": "date_added",
+    "name": "song_name COLLATE NOCASE",
+    "artist": "artist COLLATE NOCASE",
+}
+
+LIKED_SONG_UPSERT = """
+    INSERT INTO liked_songs (id, song_name, artist, url, date_added, type, cover_art_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (song_name COLLATE NOCASE, artist COLLATE NOCASE) DO UPDATE SET
+        type = CASE WHEN COALESCE(liked_songs.url, '') = '' THEN excluded.type ELSE liked_songs.type END,
+        url = COALESCE(NULLIF(liked_songs.url, ''), excluded.url),
+        cover_art_url = COALESCE(NULLIF(liked_songs.cover_art_url, ''), excluded.cover_art_url)
+"""
+
 def init_liked_songs_db():
-    conn = sqlite3.connect(LIKED_SONGS_DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS liked_songs (
-            id TEXT PRIMARY KEY,
-            song_name TEXT,
-            artist TEXT,
-            url TEXT,
-            date_added TEXT,
-            type TEXT,
-            cover_art_url TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """Create/migrate the liked songs schema. Run once at startup."""
+    liked_songs_db.migrate(LIKED_SONGS_MIGRATIONS)
+
+def liked_song_type(url):
+    if url and ("youtube.com" in url or "youtu.be" in url):
+        return "youtube"
+    if url and "spotify.com" in url:
+        return "spotify"
+    return "mpd"
+
+def _liked_song_row(song_name, url, song_type, artist, cover_art_url, date_added):
+    return (str(uuid.uuid4()), song_name.strip(), (artist or "").strip(), url or "",
+            date_added, song_type, cover_art_url or "")
 
 def add_liked_song(song_name, url, song_type, artist="", cover_art_url=""):
-    conn = sqlite3.connect(LIKED_SONGS_DB_PATH)
-    c = conn.cursor()
-    # Check for existing song by name (case-insensitive)
-    c.execute("SELECT id FROM liked_songs WHERE LOWER(song_name) = LOWER(?)", (song_name,))
-    existing = c.fetchone()
-    if existing:
-        conn.close()
+    """
+    Add a song, keyed case-insensitively on (title, artist). Adding one that
+    exists only fills in its missing url/cover art.
+    """
+    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    row = _liked_song_row(song_name, url, song_type, artist, cover_art_url, date_added)
+    with liked_songs_db.transaction() as conn:
+        song_id = conn.execute(LIKED_SONG_UPSERT + " RETURNING id", row).fetchone()[0]
+    if song_id != row[0]:
         return {
             "status": "already_added",
             "message": f"Song '{song_name}' already exists in liked songs.",
-            "id": existing[0]
+            "id": song_id
         }
-    song_id = str(uuid.uuid4())
-    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute(
-        "INSERT INTO liked_songs (id, song_name, artist, url, date_added, type, cover_art_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (song_id, song_name, artist, url, date_added, song_type, cover_art_url)
-    )
-    conn.commit()
-    conn.close()
     return {
         "id": song_id,
-        "song_name": song_name,
-        "artist": artist,
-        "url": url,
+        "song_name": row[1],
+        "artist": row[2],
+        "url": row[3],
         "date_added": date_added,
         "type": song_type,
-        "cover_art_url": cover_art_url,
+        "cover_art_url": row[6],
         "status": "added"
     }
 
-def get_all_liked_songs():
-    conn = sqlite3.connect(LIKED_SONGS_DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, song_name, artist, url, date_added, type, cover_art_url FROM liked_songs")
-    rows = c.fetchall()
-    conn.close()
-    return [
+def import_liked_songs(songs):
+    """
+    Bulk-add songs (dicts with song_name and optional artist, url, cover_art_url)
+    in one transaction. Returns how many were added and how many already existed.
+    """
+    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [
+        _liked_song_row(song["song_name"], song.get("url"), liked_song_type(song.get("url")),
+                        song.get("artist"), song.get("cover_art_url"), date_added)
+        for song in songs
+    ]
+    with liked_songs_db.transaction() as conn:
+        before = conn.execute("SELECT COUNT(*) FROM liked_songs").fetchone()[0]
+        conn.executemany(LIKED_SONG_UPSERT, rows)
+        added = conn.execute("SELECT COUNT(*) FROM liked_songs").fetchone()[0] - before
+    return {"added": added, "already_added": len(rows) - added}
+
+def query_liked_songs(sort="added", order="desc", limit=None, cursor=None, song_type=None, artist=None):
+    """
+    Keyset-paginated liked songs. Returns {"songs", "next_cursor", "total"};
+    `total` is only counted for the first page. Raises ValueError on bad arguments.
+    """
+    if sort not in LIKED_SORT_EXPRESSIONS:
+        raise ValueError(f"sort must be one of: {', '.join(LIKED_SORT_EXPRESSIONS)}")
+    filters = []
+    if song_type:
+        filters.append(("type = ?", song_type))
+    if artist:
+        filters.append(("artist = ? COLLATE NOCASE", artist))
+    rows, next_cursor, total = keyset_page(
+        liked_songs_db.connection(), "liked_songs",
+        "id, song_name, artist, url, date_added, type, cover_art_url",
+        sort_expr=LIKED_SORT_EXPRESSIONS[sort], key_column="id", order=order,
+        filters=filters, limit=limit, cursor=cursor,
+    )
+    songs = [
         {
-            "id": row[0],
-            "song_name": row[1],
-            "artist": row[2],
-            "url": row[3],
-            "date_added": row[4],
-            "type": row[5],
-            "cover_art_url": row[6]
+            "id": row["id"],
+            "song_name": row["song_name"],
+            "artist": row["artist"],
+            "url": row["url"],
+            "date_added": row["date_added"],
+            "type": row["type"],
+            "cover_art_url": row["cover_art_url"]
         }
         for row in rows
     ]
-    
+    return {"songs": songs, "next_cursor": next_cursor, "total": total}
+
+def get_all_liked_songs():
+    return query_liked_songs()["songs"]
 
 def get_lan_ip():
     try:
@@ -98,9 +172,9 @@ def get_lan_ip():
 def is_spotify_setup():
     return os.path.exists(AUTH_PATH)
 
-def load_config():
-    with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+# Shared Spotify client; the token is refreshed in the background (see main's lifespan)
+spotify_manager = SpotifyClientManager(config_store.get)
+config_store.on_change(spotify_manager.on_config_change)
 
 def save_auth(data):
     with open(AUTH_PATH, "w") as f:
@@ -112,107 +186,297 @@ def load_auth():
     with open(AUTH_PATH, "r") as f:
         return yaml.safe_load(f)
 
+FULL_SYNC_INTERVAL = 24 * 60 * 60  # seconds between full Spotify reconciliations
+SPOTIFY_PAGE_SIZE = 50  # max allowed by the saved-tracks endpoint
+SPOTIFY_FETCH_WORKERS = 4  # pages fetched in parallel during a full sync
+SPOTIFY_MAX_429_RETRIES = 5
+
+spotify_rate_limiter = TokenBucket(rate=10, capacity=10)
+
+def _add_spotify_added_at(conn):
+    # Databases created before incremental sync lack the column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(liked_songs)")}
+    if "added_at" not in columns:
+        conn.execute("ALTER TABLE liked_songs ADD COLUMN added_at TEXT")
+
+SPOTIFY_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS liked_songs (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        artist TEXT,
+        album_art TEXT,
+        spotify_url TEXT
+    )
+    """,
+    _add_spotify_added_at,
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+    # Keyset pagination: one index per sort key
+    """
+    CREATE INDEX IF NOT EXISTS idx_spotify_songs_added ON liked_songs (COALESCE(added_at, ''), id);
+    CREATE INDEX IF NOT EXISTS idx_spotify_songs_name ON liked_songs (COALESCE(name, '') COLLATE NOCASE, id);
+    CREATE INDEX IF NOT EXISTS idx_spotify_songs_artist ON liked_songs (COALESCE(artist, '') COLLATE NOCASE, id)
+    """,
+]
+
+# Sort keys for /songs/spotify, each backed by an index above
+SPOTIFY_SORT_EXPRESSIONS = {
+    "added": "COALESCE(added_at, '')",
+    "name": "COALESCE(name, '') COLLATE NOCASE",
+    "artist": "COALESCE(artist, '') COLLATE NOCASE",
+}
+
 def init_spotify_db():
-    conn = sqlite3.connect(SPOTIFY_DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS liked_songs (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            artist TEXT,
-            album_art TEXT,
-            spotify_url TEXT
+    """Create/migrate the Spotify liked songs schema. Run once at startup."""
+    spotify_db.migrate(SPOTIFY_MIGRATIONS)
+
+def get_sync_state(key):
+    row = spotify_db.connection().execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_sync_state(**values):
+    with spotify_db.transaction() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in values.items()]
         )
+
+SPOTIFY_SONG_COLUMNS = ("id", "name", "artist", "album_art", "spotify_url", "added_at")
+
+def _bump_songs_version(conn):
+    conn.execute("""
+        INSERT INTO sync_state (key, value) VALUES ('liked_songs_version', '1')
+        ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
     """)
-    conn.commit()
-    conn.close()
+
+def get_songs_version():
+    """Counter bumped whenever the Spotify liked songs change; use it to invalidate caches."""
+    return int(get_sync_state("liked_songs_version") or 0)
 
 def save_songs_to_db(songs):
-    conn = sqlite3.connect(SPOTIFY_DB_PATH)
-    c = conn.cursor()
-    for song in songs:
-        c.execute("""
-            INSERT OR REPLACE INTO liked_songs (id, name, artist, album_art, spotify_url)
-            VALUES (?, ?, ?, ?, ?)
-        """, (song["id"], song["name"], song["artist"], song["album_art"], song["spotify_url"]))
-    conn.commit()
-    conn.close()
+    """
+    Apply a batch of songs as a diff: the batch is staged in a temp table and
+    only new or changed rows are written. Returns {"added": n, "updated": n}.
+    """
+    columns = ", ".join(SPOTIFY_SONG_COLUMNS)
+    with spotify_db.transaction() as conn:
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS incoming_songs ({columns}, PRIMARY KEY (id))")
+        conn.execute("DELETE FROM incoming_songs")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO incoming_songs ({columns}) VALUES ({', '.join('?' * len(SPOTIFY_SONG_COLUMNS))})",
+            [tuple(song.get(c) for c in SPOTIFY_SONG_COLUMNS) for song in songs]
+        )
+        updated = conn.execute(f"""
+            UPDATE liked_songs SET {', '.join(f"{c} = i.{c}" for c in SPOTIFY_SONG_COLUMNS[1:])}
+            FROM incoming_songs AS i
+            WHERE liked_songs.id = i.id AND ({' OR '.join(f"liked_songs.{c} IS NOT i.{c}" for c in SPOTIFY_SONG_COLUMNS[1:])})
+        """).rowcount
+        added = conn.execute(f"""
+            INSERT INTO liked_songs ({columns})
+            SELECT {columns} FROM incoming_songs WHERE id NOT IN (SELECT id FROM liked_songs)
+        """).rowcount
+        conn.execute("DELETE FROM incoming_songs")
+        if added or updated:
+            _bump_songs_version(conn)
+    return {"added": added, "updated": updated}
 
-def get_songs_from_db():
-    conn = sqlite3.connect(SPOTIFY_DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, name, artist, album_art, spotify_url FROM liked_songs")
-    rows = c.fetchall()
-    conn.close()
-    return [
-        {"id": row[0], "name": row[1], "artist": row[2], "album_art": row[3], "spotify_url": row[4]}
+def delete_songs_from_db(song_ids):
+    with spotify_db.transaction() as conn:
+        conn.executemany("DELETE FROM liked_songs WHERE id = ?", [(song_id,) for song_id in song_ids])
+        if song_ids:
+            _bump_songs_version(conn)
+
+def query_songs_from_db(sort="added", order="desc", limit=None, cursor=None, artist=None):
+    """
+    Keyset-paginated Spotify liked songs. Returns {"songs", "next_cursor", "total"};
+    `total` is only counted for the first page. Raises ValueError on bad arguments.
+    """
+    if sort not in SPOTIFY_SORT_EXPRESSIONS:
+        raise ValueError(f"sort must be one of: {', '.join(SPOTIFY_SORT_EXPRESSIONS)}")
+    filters = [("artist = ? COLLATE NOCASE", artist)] if artist else []
+    rows, next_cursor, total = keyset_page(
+        spotify_db.connection(), "liked_songs", "id, name, artist, album_art, spotify_url",
+        sort_expr=SPOTIFY_SORT_EXPRESSIONS[sort], key_column="id", order=order,
+        filters=filters, limit=limit, cursor=cursor,
+    )
+    songs = [
+        {"id": row["id"], "name": row["name"], "artist": row["artist"],
+         "album_art": row["album_art"], "spotify_url": row["spotify_url"]}
         for row in rows
     ]
+    return {"songs": songs, "next_cursor": next_cursor, "total": total}
+
+def get_songs_from_db():
+    return query_songs_from_db()["songs"]
+
+def get_spotify_client():
+    return spotify_manager.client()
+
+def _saved_track_to_song(item):
+    track = item["track"]
+    return {
+        "id": track["id"],
+        "name": track["name"],
+        "artist": track["artists"][0]["name"],
+        "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+        "spotify_url": track["external_urls"]["spotify"],
+        "added_at": item["added_at"],
+    }
+
+def spotify_call(fn, *args, **kwargs):
+    """Call a spotipy method through the shared rate limiter, waiting out 429s."""
+    for attempt in range(SPOTIFY_MAX_429_RETRIES + 1):
+        spotify_rate_limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except spotipy.SpotifyException as e:
+            if e.http_status != 429 or attempt == SPOTIFY_MAX_429_RETRIES:
+                raise
+            retry_after = int((e.headers or {}).get("Retry-After", 1))
+            print(f"⏳ Spotify rate limit hit, pausing {retry_after}s")
+            spotify_rate_limiter.pause(retry_after)
+
+def _page_songs(results):
+    # Local files have no Spotify ID
+    return [_saved_track_to_song(item) for item in results["items"] if item["track"] and item["track"]["id"]]
+
+def _fetch_all_saved_tracks(sp, on_page):
+    """
+    Fetch every saved track: the first page gives `total`, the remaining
+    offsets are fetched in parallel. `on_page(songs)` is called on this thread
+    as each page arrives, so rows can be written without collecting everything.
+    Returns (total reported by Spotify, API calls).
+    """
+    results = spotify_call(sp.current_user_saved_tracks, limit=SPOTIFY_PAGE_SIZE)
+    total = results["total"]
+    on_page(_page_songs(results))
+    offsets = range(SPOTIFY_PAGE_SIZE, total, SPOTIFY_PAGE_SIZE)
+    with ThreadPoolExecutor(max_workers=SPOTIFY_FETCH_WORKERS) as pool:
+        futures = [
+            pool.submit(spotify_call, sp.current_user_saved_tracks, limit=SPOTIFY_PAGE_SIZE, offset=offset)
+            for offset in offsets
+        ]
+        for future in as_completed(futures):
+            on_page(_page_songs(future.result()))
+    return total, 1 + len(offsets)
+
+def sync_liked_songs_from_spotify(full=False):
+    """
+    Bring the local liked_songs table up to date with Spotify.
 
-def fetch_liked_songs_from_spotify():
-    auth = load_auth()
-    config = load_config()
+    Saved tracks come back newest first, so a routine sync pages only until it
+    reaches the newest `added_at` seen last time (usually one call). The first
+    page's `total` then tells us whether anything was unliked: if the local
+    count doesn't match, or FULL_SYNC_INTERVAL has passed, we fall back to a
+    full reconciliation that also removes unliked tracks.
+    """
     import time
-    if auth and "access_token" in auth and "expires_at" in auth:
-        if auth["expires_at"] > int(time.time()):
-            sp = spotipy.Spotify(auth=auth["access_token"])
-        else:
-            sp_oauth = SpotifyOAuth(
-                client_id=config["spotify_client_id"],
-                client_secret=config["spotify_client_secret"],
-                redirect_uri=config["spotify_redirect_uri"],
-                scope=SPOTIFY_SCOPES,
-                cache_path=AUTH_PATH
-            )
-            token_info = sp_oauth.refresh_access_token(auth["refresh_token"])
-            save_auth(token_info)
-            sp = spotipy.Spotify(auth=token_info["access_token"])
-    else:
-        sp_oauth = SpotifyOAuth(
-            client_id=config["spotify_client_id"],
-            client_secret=config["spotify_client_secret"],
-            redirect_uri=config["spotify_redirect_uri"],
-            scope=SPOTIFY_SCOPES,
-            cache_path=AUTH_PATH
-        )
-        token_info = sp_oauth.get_access_token(as_dict=True)
-        save_auth(token_info)
-        sp = spotipy.Spotify(auth=token_info["access_token"])
-
-    songs = []
-    results = sp.current_user_saved_tracks(limit=50)
-    while results:
-        for item in results["items"]:
-            track = item["track"]
-            song = {
-                "id": track["id"],
-                "name": track["name"],
-                "artist": track["artists"][0]["name"],
-                "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-                "spotify_url": track["external_urls"]["spotify"]
-            }
-            songs.append(song)
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
-    return songs
+    sp = get_spotify_client()
+    watermark = get_sync_state("liked_added_at")
+    last_full = float(get_sync_state("last_full_sync") or 0)
+    # Saved tracks without a Spotify ID (local files) that Spotify still counts in `total`
+    unsyncable = int(get_sync_state("unsyncable_count") or 0)
+
+    known = {row[0] for row in spotify_db.connection().execute("SELECT id FROM liked_songs")}
+
+    if not full and watermark and time.time() - last_full < FULL_SYNC_INTERVAL:
+        new_songs = []
+        api_calls = 1
+        results = spotify_call(sp.current_user_saved_tracks, limit=SPOTIFY_PAGE_SIZE)
+        total = results["total"]
+        while results:
+            reached_known = False
+            for item in results["items"]:
+                track_id = (item["track"] or {}).get("id")
+                if item["added_at"] < watermark or (item["added_at"] == watermark and track_id in known):
+                    reached_known = True
+                    break
+                if track_id and track_id not in known:
+                    new_songs.append(_saved_track_to_song(item))
+            if reached_known or not results["next"]:
+                break
+            results = spotify_call(sp.next, results)
+            api_calls += 1
+
+        save_songs_to_db(new_songs)
+        if len(known) + len(new_songs) + unsyncable == total:
+            if new_songs:
+                set_sync_state(liked_added_at=max(song["added_at"] for song in new_songs))
+            return {"mode": "incremental", "added": len(new_songs), "updated": 0, "removed": 0,
+                    "synced_count": total - unsyncable, "api_calls": api_calls}
+        print(f"🔁 Spotify liked songs: {len(known) + len(new_songs)} local vs {total - unsyncable} on Spotify, running a full sync")
+        known |= {song["id"] for song in new_songs}
+
+    remote_ids = set()
+    newest = ""
+    changes = {"added": 0, "updated": 0}
+
+    def save_page(songs):
+        nonlocal newest
+        for key, count in save_songs_to_db(songs).items():
+            changes[key] += count
+        remote_ids.update(song["id"] for song in songs)
+        newest = max([newest, *(song["added_at"] for song in songs)])
+
+    total, api_calls = _fetch_all_saved_tracks(sp, save_page)
+    removed = known - remote_ids
+    delete_songs_from_db(removed)
+    set_sync_state(
+        liked_added_at=newest,
+        last_full_sync=time.time(),
+        unsyncable_count=total - len(remote_ids)
+    )
+    return {"mode": "full", "added": changes["added"], "updated": changes["updated"], "removed": len(removed),
+            "synced_count": len(remote_ids), "api_calls": api_calls}
+
+def extract_youtube_id(url: str) -> str | None:
+    # Match typical YouTube URL formats
+    patterns = [
+        r"(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([^\s&]+)",
+        r"(?:https?://)?youtu\.be/([^\s?/]+)",
+        r"(?:https?://)?(?:www\.)?youtube\.com/embed/([^\s?/]+)"
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+def extract_spotify_id(url: str) -> tuple[str, str] | None:
+    """Return (kind, id) for a Spotify track/album/playlist URL or URI."""
+    match = re.search(r"(track|album|playlist)[/:]([A-Za-z0-9]+)", url)
+    if match:
+        return match.group(1), match.group(2)
+    return None
+
+def download_key(url: str) -> str | None:
+    """
+    Stable identity of what a URL downloads, e.g. "youtube:dQw4w9WgXcQ" or
+    "spotify:track:4uLU6hMCjMI75M1A2tKUQC". None if the URL isn't recognised.
+    """
+    if "spotify" in url:
+        spotify_id = extract_spotify_id(url)
+        return f"spotify:{spotify_id[0]}:{spotify_id[1]}" if spotify_id else None
+    video_id = extract_youtube_id(url)
+    return f"youtube:{video_id}" if video_id else None
 
 def search_youtube_url(query: str) -> str | None:
     """
     Use yt-dlp to search YouTube and return the URL of the best match.
     """
     try:
-        search_cmd = [
-            "yt-dlp",
-            f"ytsearch1:{query}",
-            "--print", "webpage_url"
-        ]
-        result = subprocess.run(search_cmd, capture_output=True, text=True, check=True, timeout=60)  # timeout 60s
-        url = result.stdout.strip().splitlines()[0]
-        return url
-    except subprocess.TimeoutExpired:
-        print("yt-dlp search timed out")
+        entries = ytdlp_extractor.search(query, 1, timeout=60)
+        if not entries:
+            return None
+        return entries[0].get("webpage_url") or entries[0].get("url")
+    except ExtractionError as e:
+        print(f"yt-dlp search failed: {e}")
         return None
     except Exception as e:
         print(f"Error searching YouTube: {e}")
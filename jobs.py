@@ -0,0 +1,362 @@
+"""
+Registry of download jobs, shared by every downloader so the API can list,
+inspect and cancel them in one place.
+
+Jobs are persisted to SQLite on every state change, so pending downloads
+survive a restart and are picked up again by their downloader.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, fields
+from typing import Optional
+
+from constants import DOWNLOAD_QUEUE_DB_PATH
+
+# Job states
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+MAX_ATTEMPTS = 5  # per job, before it is marked failed
+RETRY_BACKOFF = 10  # seconds before the first retry, doubled after each failure
+MAX_RETRY_BACKOFF = 10 * 60
+HISTORY_TTL = 7 * 24 * 60 * 60  # failed/cancelled jobs are forgotten after a week
+
+# Columns stored in the jobs table; live progress (bytes, speed, eta, detail) is not persisted
+PERSISTED_FIELDS = ("id", "url", "source", "media_key", "parent_id", "state", "total_bytes", "filename", "error",
+                    "attempts", "next_attempt_at", "created_at", "updated_at")
+# Persisted fields that don't trigger a write on their own: updated_at changes on every
+# update, and total_bytes may be a yt-dlp estimate that moves with each progress tick
+UNTRIGGERED_FIELDS = ("total_bytes", "updated_at")
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying won't fix (e.g. a missing binary); the job fails right away."""
+
+
+@dataclass
+class DownloadJob:
+    url: str
+    source: str
+    media_key: Optional[str] = None  # see functions.download_key; used for deduplication
+    parent_id: Optional[str] = None  # playlist/album job this track was expanded from
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: str = QUEUED
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None  # bytes/s
+    eta: Optional[int] = None  # seconds
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    detail: Optional[str] = None  # latest progress message from the downloader
+    attempts: int = 0
+    next_attempt_at: Optional[float] = None  # set while waiting to retry
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def to_dict(self) -> dict:
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "cancel_event"}
+        if self.total_bytes:
+            data["percent"] = round(self.downloaded_bytes * 100 / self.total_bytes, 1)
+        else:
+            data["percent"] = None
+        return data
+
+
+class JobRegistry:
+    def __init__(self, db_path: Optional[str] = DOWNLOAD_QUEUE_DB_PATH):
+        """Pass db_path=None for an in-memory registry."""
+        self.db_path = db_path
+        self._jobs: dict[str, DownloadJob] = {}
+        self._by_media_key: dict[str, str] = {}  # media_key -> newest job id
+        self._lock = threading.Lock()
+        if db_path:
+            self._init_db()
+            self._load()
+
+    # ------------------------------ storage ------------------------------ #
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS download_jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                source TEXT NOT NULL,
+                media_key TEXT,
+                parent_id TEXT,
+                state TEXT NOT NULL,
+                total_bytes INTEGER,
+                filename TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL,
+                created_at REAL,
+                updated_at REAL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(download_jobs)")}
+        for column in ("media_key", "parent_id"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE download_jobs ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_download_jobs_state ON download_jobs (state)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_download_jobs_media_key ON download_jobs (media_key)")
+        conn.commit()
+        conn.close()
+
+    def _load(self):
+        """Load saved jobs; anything that was mid-download when we stopped goes back to queued."""
+        conn = self._connect()
+        # Completed jobs are kept: they are the index of what has already been downloaded
+        conn.execute(
+            "DELETE FROM download_jobs WHERE state IN (?, ?) AND updated_at < ?",
+            (FAILED, CANCELLED, time.time() - HISTORY_TTL)
+        )
+        conn.execute(
+            "UPDATE download_jobs SET state = ? WHERE state IN (?, ?)", (QUEUED, DOWNLOADING, PROCESSING)
+        )
+        conn.commit()
+        conn.row_factory = sqlite3.Row
+        for row in conn.execute(f"SELECT {', '.join(PERSISTED_FIELDS)} FROM download_jobs ORDER BY created_at"):
+            self._index(DownloadJob(**dict(row)))
+        conn.close()
+
+    def _save(self, job: DownloadJob):
+        if not self.db_path:
+            return
+        conn = self._connect()
+        conn.execute(
+            f"INSERT OR REPLACE INTO download_jobs ({', '.join(PERSISTED_FIELDS)}) "
+            f"VALUES ({', '.join('?' * len(PERSISTED_FIELDS))})",
+            [getattr(job, f) for f in PERSISTED_FIELDS]
+        )
+        conn.commit()
+        conn.close()
+
+    # ------------------------------ jobs ------------------------------ #
+
+    def _index(self, job: DownloadJob):
+        """Track a job (caller holds the lock or is still constructing the registry)."""
+        self._jobs[job.id] = job
+        if job.media_key:
+            self._by_media_key[job.media_key] = job.id
+
+    def add(self, job: DownloadJob) -> DownloadJob:
+        with self._lock:
+            self._index(job)
+            self._save(job)
+        return job
+
+    def add_unique(self, job: DownloadJob) -> tuple[DownloadJob, bool]:
+        """
+        Add the job unless the same media is already queued, running or downloaded.
+        Returns (job, True) when added, or (existing job, False) for a duplicate.
+        """
+        stale = None
+        while True:
+            with self._lock:
+                existing = self._find(job.media_key)
+                if existing is None or existing is stale:
+                    self._index(job)
+                    self._save(job)
+                    return job, True
+            # Checked outside the lock, since it touches the disk
+            if not self._file_missing(existing):
+                return existing, False
+            stale = existing
+
+    def _find(self, media_key: Optional[str]) -> Optional[DownloadJob]:
+        """Newest live or completed job for media_key (caller holds the lock)."""
+        job = self._jobs.get(self._by_media_key.get(media_key)) if media_key else None
+        if job is None or job.state in (FAILED, CANCELLED) or job.cancelled:
+            return None
+        return job
+
+    @staticmethod
+    def _file_missing(job: DownloadJob) -> bool:
+        """A completed job whose file is unknown or has since been deleted doesn't count as downloaded."""
+        return job.state == COMPLETED and not (job.filename and os.path.exists(job.filename))
+
+    def get(self, job_id: str) -> Optional[DownloadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self, source: str) -> list[DownloadJob]:
+        """Queued jobs for one downloader, oldest first (used to resume after a restart)."""
+        return [j for j in self.list(QUEUED) if j.source == source and not j.cancelled]
+
+    def list(self, state: Optional[str] = None) -> list[DownloadJob]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if state:
+            jobs = [j for j in jobs if j.state == state]
+        return sorted(jobs, key=lambda j: j.created_at)
+
+    def update(self, job_id: str, **fields) -> Optional[DownloadJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            changed = [key for key, value in fields.items() if getattr(job, key) != value]
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.updated_at = time.time()
+            if job.media_key and "media_key" in changed:
+                self._by_media_key[job.media_key] = job.id
+            # Only real changes to stored columns hit the database; progress ticks stay in memory
+            if any(key in PERSISTED_FIELDS and key not in UNTRIGGERED_FIELDS for key in changed):
+                self._save(job)
+            return job
+
+    def cancel(self, job_id: str) -> Optional[DownloadJob]:
+        """
+        Flag a job, and any track jobs expanded from it, as cancelled. Queued
+        jobs are skipped by the workers; running ones stop at their next
+        progress callback.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            children = [j.id for j in self._jobs.values() if j.parent_id == job_id]
+        if job is None:
+            return None
+        if job.state not in FINISHED_STATES:
+            job.cancel_event.set()
+            if job.state == QUEUED:
+                self.update(job_id, state=CANCELLED)
+        # A playlist/album job is usually already completed (expanded) by now
+        for child_id in children:
+            self.cancel(child_id)
+        return job
+
+
+class JobRunner(ABC):
+    """
+    Pool of worker threads running one kind of download job (`source`).
+
+    Subclasses implement `run(job)`, which downloads the job's URL and returns
+    extra fields to record on completion, or raises on failure. Failed jobs are
+    retried with exponential backoff, except for PermanentJobError; a job
+    cancelled through the registry is marked cancelled instead, whatever `run` raised.
+    """
+
+    source = ""
+
+    def __init__(self, workers: int, registry: JobRegistry):
+        self.download_queue = queue.Queue()
+        self.registry = registry
+        self.workers = [
+            threading.Thread(target=self._worker, name=f"{self.source}-download-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self.workers:
+            worker.start()
+
+        # Resume whatever was still pending when the server last stopped
+        for job in self.registry.pending(self.source):
+            print(f"🔁 Resuming download: {job.url} (job {job.id})")
+            self._schedule(job)
+
+    @abstractmethod
+    def run(self, job: DownloadJob) -> Optional[dict]:
+        ...
+
+    def _schedule(self, job: DownloadJob):
+        """Queue a job now, or once its retry backoff has elapsed."""
+        delay = (job.next_attempt_at or 0) - time.time()
+        if delay <= 0:
+            self.download_queue.put(job)
+            return
+        timer = threading.Timer(delay, self.download_queue.put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _worker(self):
+        while True:
+            job = self.download_queue.get()
+            if job is None:
+                self.download_queue.task_done()
+                break
+
+            if job.cancelled:
+                self.download_queue.task_done()
+                continue
+
+            print(f"\n=== Starting download: {job.url} ({threading.current_thread().name}) ===")
+            self.registry.update(job.id, state=DOWNLOADING, attempts=job.attempts + 1, next_attempt_at=None)
+
+            try:
+                result = self.run(job) or {}
+                self.registry.update(job.id, state=COMPLETED, speed=None, eta=0, **result)
+                print(f"✅ Downloaded: {job.url}")
+            except Exception as e:
+                self._handle_failure(job, e)
+
+            self.download_queue.task_done()
+
+    def _handle_failure(self, job: DownloadJob, error: Exception):
+        if job.cancelled:
+            self.registry.update(job.id, state=CANCELLED, speed=None, eta=None)
+            print(f"🛑 Cancelled download: {job.url}")
+            return
+        if isinstance(error, PermanentJobError):
+            print(f"⚠️ Error downloading {job.url}, not retrying: {error}")
+            self.registry.update(job.id, state=FAILED, error=str(error), speed=None, eta=None)
+            return
+        if job.attempts >= MAX_ATTEMPTS:
+            print(f"⚠️ Error downloading {job.url}, giving up after {job.attempts} attempts: {error}")
+            self.registry.update(job.id, state=FAILED, error=str(error), speed=None, eta=None)
+            return
+        delay = min(RETRY_BACKOFF * 2 ** (job.attempts - 1), MAX_RETRY_BACKOFF)
+        print(f"⚠️ Error downloading {job.url}, retrying in {delay}s: {error}")
+        self.registry.update(
+            job.id, state=QUEUED, error=str(error), speed=None, eta=None,
+            next_attempt_at=time.time() + delay
+        )
+        self._schedule(job)
+
+    def enqueue(self, url: str, media_key: Optional[str] = None, **fields) -> tuple[DownloadJob, bool]:
+        """
+        Queue a download. Returns (job, created); if the same media is already
+        queued, running or downloaded, the existing job is returned with created=False.
+        """
+        job, created = self.registry.add_unique(
+            DownloadJob(url=url, source=self.source, media_key=media_key, **fields)
+        )
+        if not created:
+            print(f"⏭️ Already {job.state}: {url} (job {job.id})")
+            return job, False
+        self._schedule(job)
+        print(f"➕ Added to queue: {url} (job {job.id})")
+        return job, True
+
+    def wait_until_done(self):
+        self.download_queue.join()
+
+    def stop(self):
+        for _ in self.workers:
+            self.download_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+# Shared by the YouTube and Spotify downloaders
+job_registry = JobRegistry()
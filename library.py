@@ -0,0 +1,266 @@
+"""
+Persistent index of the local music library.
+
+Tracks are stored in SQLite keyed by path, together with the file's size and
+mtime. A rescan only re-reads tags for files whose fingerprint changed, and
+spreads that work across CPU cores, so GET /songs never touches the disk
+beyond one query.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Callable
+
+from mutagen import File as MutagenFile
+
+from constants import LIBRARY_DB_PATH
+from pagination import keyset_page
+
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".ogg", ".opus", ".m4a", ".aac", ".wav", ".wma", ".alac", ".aiff", ".ape", ".mpc", ".wv"}
+PARALLEL_THRESHOLD = 32  # below this many changed files, a process pool costs more than it saves
+MAX_TAG_WORKERS = 4
+RESCAN_INTERVAL = 5 * 60  # seconds
+
+# Sort keys exposed by the API. Each expression has a matching index (see _init_db)
+# so keyset pagination never sorts the whole table.
+SORT_EXPRESSIONS = {
+    "path": "path",
+    "artist": "COALESCE(artist, '') COLLATE NOCASE",
+    "album": "COALESCE(album, '') COLLATE NOCASE",
+    "title": "COALESCE(title, '') COLLATE NOCASE",
+    "added": "added_at",
+}
+SONG_FIELDS = ("file", "title", "artist", "album", "track", "duration", "size_bytes", "size_mb", "added_at")
+
+
+def _read_tags(path: str) -> dict:
+    """Read tags with Mutagen. Module-level so it can run in worker processes."""
+    tags = {"title": None, "artist": None, "album": None, "track": None, "duration": None}
+    try:
+        audio = MutagenFile(path, easy=True)
+        if audio:
+            metadata = audio.tags or {}
+            tags["artist"] = metadata.get("artist", [None])[0] or None
+            tags["album"] = metadata.get("album", [None])[0] or None
+            tags["title"] = metadata.get("title", [None])[0] or None
+            tags["track"] = metadata.get("tracknumber", [None])[0] or None
+            if hasattr(audio.info, "length"):
+                tags["duration"] = int(audio.info.length)
+    except Exception:
+        pass
+    return tags
+
+
+class LibraryIndex:
+    def __init__(self, music_dir: str, db_path: str = LIBRARY_DB_PATH,
+                 on_change: Optional[Callable[[], None]] = None):
+        """`on_change` is called after a scan that added, changed or removed tracks."""
+        self.music_dir = Path(music_dir)
+        self.db_path = db_path
+        self.on_change = on_change
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_scan: Optional[dict] = None
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                track TEXT,
+                duration INTEGER,
+                size_bytes INTEGER,
+                mtime REAL,
+                added_at REAL
+            )
+        """)
+        for name, expr in SORT_EXPRESSIONS.items():
+            if name != "path":
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tracks_{name} ON tracks ({expr}, path)")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Indexes built before added_at was seeded from the file's mtime gave every
+            # track the first scan's time; backdate them the same way
+            conn.execute("UPDATE tracks SET added_at = MIN(added_at, mtime) WHERE mtime IS NOT NULL")
+            conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+
+    def _walk(self) -> dict[str, tuple[int, float]]:
+        """Return {relative path: (size, mtime)} for every audio file under music_dir."""
+        found = {}
+        stack = [self.music_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                print(f"⚠️ Cannot read {directory}: {e}")
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        # Broken symlink, or deleted since the directory was listed
+                        continue
+                    rel = os.path.relpath(entry.path, self.music_dir)
+                    found[rel] = (st.st_size, st.st_mtime)
+        return found
+
+    def scan(self) -> dict:
+        """Incrementally sync the index with the files on disk."""
+        with self._scan_lock:
+            started = time.monotonic()
+            on_disk = self._walk()
+
+            conn = self._connect()
+            indexed = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute("SELECT path, size_bytes, mtime FROM tracks")
+            }
+            changed = [p for p, fp in on_disk.items() if indexed.get(p) != fp]
+            removed = [p for p in indexed if p not in on_disk]
+
+            full_paths = [str(self.music_dir / p) for p in changed]
+            if len(changed) >= PARALLEL_THRESHOLD:
+                # Spawn, not fork: forking copies the server's other threads (workers, D-Bus, event loop) mid-state
+                with ProcessPoolExecutor(
+                    max_workers=min(MAX_TAG_WORKERS, os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context("spawn"),
+                ) as pool:
+                    tag_list = list(pool.map(_read_tags, full_paths, chunksize=16))
+            else:
+                tag_list = [_read_tags(p) for p in full_paths]
+
+            now = time.time()
+            conn.executemany(
+                """
+                INSERT INTO tracks (path, title, artist, album, track, duration, size_bytes, mtime, added_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    title = excluded.title, artist = excluded.artist, album = excluded.album,
+                    track = excluded.track, duration = excluded.duration,
+                    size_bytes = excluded.size_bytes, mtime = excluded.mtime
+                """,
+                [
+                    (p, t["title"] or Path(p).stem, t["artist"], t["album"], t["track"], t["duration"],
+                     on_disk[p][0], on_disk[p][1], min(on_disk[p][1], now))
+                    for p, t in zip(changed, tag_list)
+                ]
+            )
+            conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p in removed])
+            conn.commit()
+            conn.close()
+
+            self.last_scan = {
+                "files": len(on_disk),
+                "updated": len(changed),
+                "removed": len(removed),
+                "seconds": round(time.monotonic() - started, 3),
+                "finished_at": now,
+            }
+            print(f"📂 Library scan: {self.last_scan}")
+
+        if (changed or removed) and self.on_change:
+            self.on_change()
+        return self.last_scan
+
+    def scan_in_background(self):
+        """Run one scan on a daemon thread (no-op if a scan is already running)."""
+        if self._scan_lock.locked():
+            return
+        threading.Thread(target=self._safe_scan, daemon=True).start()
+
+    def _safe_scan(self):
+        try:
+            self.scan()
+        except Exception as e:
+            print(f"⚠️ Library scan failed: {e}")
+
+    def start(self, interval: float = RESCAN_INTERVAL):
+        """Scan now, then keep rescanning every `interval` seconds until `stop()`."""
+        def loop():
+            while not self._stop.is_set():
+                self._safe_scan()
+                self._stop.wait(interval)
+        self._stop.clear()
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def query(
+        self,
+        sort: str = "path",
+        order: str = "asc",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        artist: Optional[str] = None,
+        album: Optional[str] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        fields: Optional[list[str]] = None,
+    ) -> dict:
+        """
+        Keyset-paginated listing. `cursor` is the `next_cursor` of the previous page;
+        `total` is only counted for the first page. Raises ValueError on bad arguments.
+        """
+        if sort not in SORT_EXPRESSIONS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_EXPRESSIONS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        fields = fields or list(SONG_FIELDS)
+        unknown = [f for f in fields if f not in SONG_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        filters = []
+        if artist:
+            filters.append(("artist = ? COLLATE NOCASE", artist))
+        if album:
+            filters.append(("album = ? COLLATE NOCASE", album))
+        if min_duration is not None:
+            filters.append(("duration >= ?", min_duration))
+        if max_duration is not None:
+            filters.append(("duration <= ?", max_duration))
+
+        conn = self._connect()
+        try:
+            rows, next_cursor, total = keyset_page(
+                conn, "tracks", "path, title, artist, album, track, duration, size_bytes, added_at",
+                sort_expr=SORT_EXPRESSIONS[sort], key_column="path", order=order,
+                filters=filters, limit=limit, cursor=cursor,
+            )
+        finally:
+            conn.close()
+
+        songs = []
+        for row in rows:
+            song = {
+                "file": row["path"],
+                "title": row["title"],
+                "artist": row["artist"],
+                "album": row["album"],
+                "track": row["track"],
+                "duration": row["duration"],
+                "size_bytes": row["size_bytes"],
+                "size_mb": round(row["size_bytes"] / (1024 * 1024), 2) if row["size_bytes"] else None,
+                "added_at": row["added_at"],
+            }
+            songs.append({f: song[f] for f in fields})
+
+        return {"songs": songs, "next_cursor": next_cursor, "total": total}
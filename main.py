@@ -1,6 +1,6 @@
 from fastapi.exceptions import HTTPException
 import time
-from fastapi import FastAPI, Body, Query, Request
+from fastapi import FastAPI, Body, Query, Request, Depends
 from pydantic import BaseModel, Field
 from urllib.parse import urlparse, unquote
 import re
@@ -16,16 +16,20 @@ from fastapi.staticfiles import StaticFiles
 from uuid import uuid4
 
 from YTDLP import YTDLPDownloader
-from fastapi import BackgroundTasks
+from jobs import job_registry
+from spotdl_runner import SpotDLRunner
+from extractor import ytdlp_extractor, ExtractionError
+from media_cache import fetch_youtube_info, resolve_audio_stream
 
 
 from command import open_sp_client, control_playerctl, IGNORE_PLAYERS
+from concurrency import run_blocking, run_command, CommandError
+import concurrency
+from mpris import MPRISClient
+from player_events import PlayerEventHub
 
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from spotipy.oauth2 import SpotifyOAuth
-import spotipy
-
 from functions import *
 
 from constants import AUTH_PATH, CONFIG_PATH, SPOTIFY_DB_PATH, SPOTIFY_SCOPES
@@ -39,27 +43,36 @@ from contextlib import asynccontextmanager
 import signal
 from pathlib import Path
 
-from fastapi.responses import Response
-import shlex
+from fastapi.responses import Response, StreamingResponse
 
-from mutagen import File as MutagenFile
+from library import LibraryIndex
+from search_index import SearchIndex, SOURCES as SEARCH_SOURCES
+from mpd_client import MPDClientPool, MPDError
+from album_art import AlbumArtCache, ArtUnavailable
 
-import requests
 
 from fastapi.middleware.cors import CORSMiddleware
 
-# Create a global downloader instance
-yt_downloader = YTDLPDownloader()
+mpris_client = MPRISClient(ignore_players=IGNORE_PLAYERS)
 MUSIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "Music"))
+# Migrate the liked songs schemas once, before anything reads them
+init_liked_songs_db()
+init_spotify_db()
+search_index = SearchIndex()
+library_index = LibraryIndex(MUSIC_DIR, on_change=lambda: search_index.refresh("local"))
 
 MPD_PORT = "6601"
+mpd_pool = MPDClientPool(host="127.0.0.1", port=int(MPD_PORT))
 version="0.1.0"
 
 player_type = ""
 
-config = load_config()
-spotify_mode = config["spotify_mode"]
-control_mode = config["control_mode"]
+# Read once here for the worker pools; modes are read per request so edits apply live
+config = config_store.get()
+
+# Create a global downloader instance
+yt_downloader = YTDLPDownloader(workers=config.download_workers)
+spotdl_runner = SpotDLRunner(MUSIC_DIR, workers=config.spotdl_workers)
 
 tags_metadata = [
     {
@@ -89,6 +102,15 @@ class PlayerInfo(BaseModel):
     is_live: Optional[bool] = False
     media_url: Optional[str] = ""
     
+class LikedSongEntry(BaseModel):
+    song_name: str = Field(..., min_length=1)
+    artist: Optional[str] = ""
+    url: Optional[str] = None
+    cover_art_url: Optional[str] = None
+
+class LikedSongsImport(BaseModel):
+    songs: list[LikedSongEntry] = Field(..., max_length=50000)
+
 # INITIALISE, AND USE THIS FOR STATE MANAGEMENT
 player_info = PlayerInfo(
     is_paused=False,
@@ -167,12 +189,13 @@ auto_update_depth "0"
 
     print(f"✅ MPD started with music dir: {music_dir}")
 
-    # --- Run `mpc update` to update the DB ---
+    # --- Update the MPD DB over the pooled protocol client ---
+    mpd_pool.start()
     try:
-        subprocess.run(["mpc", "-h", "127.0.0.1", "-p", f"{MPD_PORT}", "update"], check=True)
+        await mpd_pool.execute("update")
         print("📂 MPD music database updated")
-    except subprocess.CalledProcessError as e:
-        print(f"⚠️ Failed to run `mpc update`: {e}")
+    except MPDError as e:
+        print(f"⚠️ Failed to run MPD `update`: {e}")
 
     # --- Start mpdirs2 bound publicly ---
     # mpdirs2_proc = subprocess.Popen([
@@ -189,6 +212,22 @@ auto_update_depth "0"
         "--port", f"{MPD_PORT}",
     ])
     print("✅ mpdirs2 started at http://<your-ip>:8080")
+
+    # --- Keep the library and search indexes in sync in the background ---
+    search_index.refresh_in_background("spotify", "liked")
+    library_index.start()
+
+    # --- Keep the Spotify token fresh so requests never refresh it inline ---
+    spotify_manager.start()
+
+    # --- Load yt-dlp extractors once, up front ---
+    ytdlp_extractor.warm_up()
+
+    # --- Connect the resident MPRIS client (falls back to playerctl if unavailable) ---
+    try:
+        mpris_client.start()
+    except Exception as e:
+        print(f"⚠️ MPRIS D-Bus client unavailable, using playerctl: {e}")
     
     global player_instance
     if player_instance is not None:
@@ -196,6 +235,14 @@ auto_update_depth "0"
 
     yield  # App is now running
 
+    await player_events.close()
+    mpris_client.close()
+    await mpd_pool.close()
+    library_index.stop()
+    ytdlp_extractor.shutdown()
+    concurrency.shutdown()
+    spotify_manager.stop()
+
     # --- On Shutdown: Stop mpdirs2 ---
     if mpdirs2_proc and mpdirs2_proc.poll() is None:
         mpdirs2_proc.send_signal(signal.SIGTERM)
@@ -222,40 +269,91 @@ auto_update_depth "0"
 # ----------------------------------------------------------------------------- #
 
 # PLAYERCTL DATA
-def get_playerctl_data(player: Optional[str] = None) -> PlayerInfo:
-    
-    time.sleep(0.5) 
-    # To settle the playing state, since dbus is updated asynchronously,
-    # so calling it instantly after setting state will still return the previous value.
+def mpris_generation() -> Optional[int]:
+    """
+    Marker to take *before* sending a control command, so `get_playerctl_data`
+    can wait for the PropertiesChanged signal that follows it.
+    """
+    return mpris_client.generation if mpris_client.available else None
+
+
+async def get_playerctl_data(player: Optional[str] = None, changed_since: Optional[int] = None) -> PlayerInfo:
+    """
+    Read the player's state. Pass `changed_since=mpris_generation()` (taken before
+    issuing a command) to wait until the player reports the resulting change,
+    since dbus is updated asynchronously.
+    """
+    # Convert microseconds to seconds
+    def to_seconds(us):
+        try:
+            return int(float(us)) // 1_000_000
+        except (ValueError, TypeError):
+            return 0
+
+    def read_mpris():
+        if changed_since is not None:
+            mpris_client.wait_for_change(changed_since, timeout=0.5, player=player or None)
+        return mpris_client.get_all(player or None) or {}
+
+    if mpris_client.available:
+        try:
+            props = await run_blocking("player", read_mpris)
+            metadata = props.get("Metadata", {})
+            status = props.get("PlaybackStatus", "Stopped")
+            artist = metadata.get("xesam:artist", "")
+            if isinstance(artist, list):
+                artist = ", ".join(artist)
+
+            return PlayerInfo(
+                status=status.lower(),
+                current_media_type="audio",
+                volume=int(float(props.get("Volume", 0)) * 100),
+                is_paused=(status.lower() != "playing"),
+                cache_size=0,
+                media_name=metadata.get("xesam:title", ""),
+                media_uploader=artist,
+                media_duration=to_seconds(metadata.get("mpris:length", 0)),
+                media_progress=to_seconds(props.get("Position", 0)),
+                media_url=metadata.get("xesam:url", "")
+            )
+        except Exception as e:
+            print(f"⚠️ MPRIS read failed, falling back to playerctl: {e}")
+
+    if changed_since is not None:
+        await asyncio.sleep(0.5)
+        # To settle the playing state, since dbus is updated asynchronously,
+        # so calling it instantly after setting state will still return the previous value.
     
-    def run_playerctl_command(args):
+    async def run_playerctl_command(args):
         cmd = ["playerctl", f"--ignore-player={IGNORE_PLAYERS}"]
         if player:
             cmd += ["--player", player]
         cmd += args
         try:
-            return subprocess.check_output(cmd, text=True).strip()
-        except subprocess.CalledProcessError:
+            return await run_command(cmd)
+        except CommandError:
             return None
         except FileNotFoundError:
             print("playerctl not found.")
             return None
 
-    # Fetch data
-    status = run_playerctl_command(["status"]) or "Stopped"
-    title = run_playerctl_command(["metadata", "xesam:title"]) or ""
-    artist = run_playerctl_command(["metadata", "xesam:artist"]) or ""
-    url = run_playerctl_command(["metadata", "xesam:url"]) or ""
-    volume = run_playerctl_command(["volume"]) or "0"
-    duration_us = run_playerctl_command(["metadata", "mpris:length"]) or "0"
-    position_us = run_playerctl_command(["position"]) or "0"
-
-    # Convert microseconds to seconds
-    def to_seconds(us):
-        try:
-            return int(float(us)) // 1_000_000
-        except (ValueError, TypeError):
-            return 0
+    # Fetch data (the calls are independent, so run them concurrently)
+    status, title, artist, url, volume, duration_us, position_us = await asyncio.gather(
+        run_playerctl_command(["status"]),
+        run_playerctl_command(["metadata", "xesam:title"]),
+        run_playerctl_command(["metadata", "xesam:artist"]),
+        run_playerctl_command(["metadata", "xesam:url"]),
+        run_playerctl_command(["volume"]),
+        run_playerctl_command(["metadata", "mpris:length"]),
+        run_playerctl_command(["position"]),
+    )
+    status = status or "Stopped"
+    title = title or ""
+    artist = artist or ""
+    url = url or ""
+    volume = volume or "0"
+    duration_us = duration_us or "0"
+    position_us = position_us or "0"
 
     # Final object
     return PlayerInfo(
@@ -313,26 +411,15 @@ cover_art_dir = Path(__file__).resolve().parent / "liked_songs_cover_art"
 cover_art_dir.mkdir(exist_ok=True)
 app.mount("/liked_songs_cover_art", StaticFiles(directory=str(cover_art_dir)), name="liked_songs_cover_art")
 
+album_art_cache = AlbumArtCache(str(Path(__file__).resolve().parent / "state" / "album_art"))
+
 start_time = time.monotonic()
 
 player_instance: Optional[MPVMediaPlayer] = None
 
-def check_ytdlp_available():
-    return shutil.which("yt-dlp") is not None
-
 def get_media_data(url: str) -> Optional[MediaInfo]:
     try:
-        if not check_ytdlp_available():
-            print("yt-dlp not available")
-            return None
-
-        cmd = ["yt-dlp", "-j", url]  # -j = print metadata as JSON
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=60)
-        
-        if result.returncode != 0:
-            raise Exception(f"yt-dlp error: {result.stderr.strip()}")
-
-        data = json.loads(result.stdout)
+        data = fetch_youtube_info(url, timeout=60)
         
         print(data)
         
@@ -344,31 +431,40 @@ def get_media_data(url: str) -> Optional[MediaInfo]:
         media_info.video_id=extract_youtube_id(url)  # Extract YouTube ID for reference
         
         return data
-    except subprocess.TimeoutExpired:
-        print("yt-dlp metadata fetch timed out")
+    except ExtractionError as e:
+        print(f"yt-dlp metadata fetch failed: {e}")
         return None
     except Exception as e:
         print(f"Error fetching media info: {e}")
         return None
-    
 
-def extract_youtube_id(url: str) -> str | None:
-    # Match typical YouTube URL formats
-    patterns = [
-        r"(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([^\s&]+)",
-        r"(?:https?://)?youtu\.be/([^\s?/]+)",
-        r"(?:https?://)?(?:www\.)?youtube\.com/embed/([^\s?/]+)"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
 
 
 
 
+async def start_mpv_player(url: str, info: Optional[dict] = None, started_at: Optional[float] = None) -> MPVMediaPlayer:
+    """
+    Launch mpv for `url`. In "direct" stream mode the audio stream URL is resolved
+    here (cached until it expires), so mpv can start without its own extraction.
+    Metadata and stream lookups run on the "ytdlp" pool; only mpv startup and IPC
+    use the "player" pool, so a slow extraction can't hold up other player commands.
+    """
+    is_youtube = "youtube.com" in url or "youtu.be" in url
+    if not info and is_youtube:
+        try:
+            info = await run_blocking("ytdlp", fetch_youtube_info, url)
+        except Exception as e:
+            print(f"Failed to fetch metadata: {e}")
+    stream = None
+    if config_store.get().stream_mode == "direct" and is_youtube:
+        try:
+            stream = await run_blocking("ytdlp", resolve_audio_stream, url)
+        except Exception as e:
+            print(f"⚠️ Direct stream resolution failed, letting mpv extract: {e}")
+    return await run_blocking(
+        "player", MPVMediaPlayer, url, info=info, stream=stream, started_at=started_at, fetch_info=False
+    )
+
 
 # -------------------------------------- ROUTES ---------------------------------------------------------- #
 
@@ -384,34 +480,83 @@ def server_status():
     
 # -------------------------------------------- PLAYER ---------------------------------------------------------- #
 
-@app.get("/player", tags=["Player"], summary="Get Player Status", response_model=PlayerInfo)
-def player_status():
+async def refresh_player_info() -> PlayerInfo:
     """
-    Get the current status of the media player.
+    Read the player's current state into `player_info`.
     """
     global player_info
     global player_type
     global player_instance
     
     
-    if control_mode == "mpris":
+    if config_store.get().control_mode == "mpris":
         
-        player_info = get_playerctl_data(player=player_type)
+        player_info = await get_playerctl_data(player=player_type)
         return player_info
     else:
         
         if player_instance is not None:
-            player_info.volume = int(player_instance.get_volume())
-            player_info.media_progress = int(player_instance.get_progress())
+            # Served from the observed-property snapshot, no IPC round trip
+            state = player_instance.snapshot()
+            if state["volume"] is not None:
+                player_info.volume = int(state["volume"])
+            if state["time-pos"] is not None:
+                player_info.media_progress = int(state["time-pos"])
+            if state["pause"] is not None:
+                player_info.is_paused = bool(state["pause"])
+            if state["demuxer-cache-state"]:
+                player_info.cache_size = state["demuxer-cache-state"].get("cache-size", 0)
+            # mpv goes idle (or reports eof) once the track ends; it doesn't exit
+            if state["idle-active"] or state["eof-reached"] or not player_instance.is_running():
+                player_info.status = "stopped"
+            elif state["pause"] is not None:
+                player_info.status = "paused" if state["pause"] else "playing"
             
         
         return player_info
+
+
+async def player_state() -> dict:
+    return (await refresh_player_info()).model_dump(mode="json")
+
+# One poller feeds every /player/events subscriber
+player_events = PlayerEventHub(player_state)
+mpris_client.on_change(player_events.notify)
+
+
+async def push_player_change():
+    """Dependency of the control routes: push their result to /player/events now rather than at the next tick."""
+    yield
+    player_events.notify()
+
+
+@app.get("/player", tags=["Player"], summary="Get Player Status", response_model=PlayerInfo)
+async def player_status():
+    """
+    Get the current status of the media player.
+    """
+    return await refresh_player_info()
+
+@app.get("/player/events", tags=["Player"], summary="Stream Player Status")
+async def player_events_stream():
+    """
+    Server-sent events with the player status. The first `snapshot` event has
+    the full PlayerInfo, each `update` event only the fields that changed.
+    All clients share one poller, so more clients don't mean more player reads.
+    """
+    return StreamingResponse(
+        player_events.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    
     
-@app.post("/player/play")
-def play_media(MediaData: Optional[MediaData] = Body(None)):
+@app.post("/player/play", dependencies=[Depends(push_player_change)])
+async def play_media(MediaData: Optional[MediaData] = Body(None)):
     """
     Play media in the player.
     """
+    request_started = time.monotonic()
     global player_instance
     global player_info
     global player_type
@@ -420,14 +565,15 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
     
     
     #  TODO IF player is already initialised then just play the media
-    if control_mode == "mpris" and not MediaData:
+    if config_store.get().control_mode == "mpris" and not MediaData:
         print(f"▶️ PLAYER TYPE: {player_type}")
-        control_playerctl("play-pause", player=player_type)
-        player_info =  get_playerctl_data(player=player_type)
+        since = mpris_generation()
+        await control_playerctl("play-pause", player=player_type)
+        player_info = await get_playerctl_data(player=player_type, changed_since=since)
         return player_info
     else:
         if player_instance is not None and not MediaData:
-            player_instance.play()
+            await run_blocking("player", player_instance.play)
     
     if MediaData is None or (not MediaData.url and not MediaData.song_name):
         raise HTTPException(status_code=400, detail="Media URL or song name is required.")
@@ -437,33 +583,31 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
         song_name = MediaData.song_name.strip()
         print(f"🎵 MPD Song Name: '{song_name}'")
 
-        # Clear MPD playlist (optional)
-        subprocess.run(["mpc", f"--port={MPD_PORT}", "clear"], check=False)
-
-        # Try to find and add song by title
-        cmd = ["mpc", f"--port={MPD_PORT}", "findadd", "title", song_name]
-        print("🔧 Running command:", " ".join(shlex.quote(arg) for arg in cmd))
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        print("stdout:", result.stdout.strip())
-        print("stderr:", result.stderr.strip())
-
-        if result.returncode != 0:
+        # Resolve the name to a library file through the search index; prefix matches only,
+        # so a name with no such track 404s instead of playing a fuzzy near-miss
+        matches = await run_blocking("library", search_index.search, song_name, limit=1, sources=["local"], fuzzy=False)
+        if not matches:
             raise HTTPException(status_code=404, detail=f"Song not found in MPD library: '{song_name}'")
+        song_file = matches[0]["ref"]
+        print(f"🔎 Resolved '{song_name}' to '{song_file}'")
 
         # Stop any other players
-        control_playerctl("--player=mpv,spotify,mpd,firefox stop")
+        await control_playerctl("--player=mpv,spotify,mpd,firefox stop")
         if player_instance is not None:
             player_instance = None
 
-        # Play the added song
-        subprocess.run(["mpc", f"--port={MPD_PORT}", "play"], check=False)
+        # Clear the queue, add the resolved file and play it in one round trip
+        since = mpris_generation()
+        try:
+            await mpd_pool.execute_list([["clear"], ["add", song_file], ["play"]])
+        except MPDError as e:
+            print(f"⚠️ MPD playback failed: {e}")
+            raise HTTPException(status_code=404, detail=f"Song not found in MPD library: '{song_name}'")
         
         player_type = "mpd"
 
         # Refresh player info from playerctl
-        player_info = get_playerctl_data(player=player_type)
+        player_info = await get_playerctl_data(player=player_type, changed_since=since)
         
         # WHY this way? bcoz when running the subprocess command, it returns blank.
         if player_info.status != "playing":
@@ -489,7 +633,7 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
     
     # YOUTUBE HANDLING
     if "youtube.com" in url or "youtu.be" in url:
-        media = get_media_data(url)
+        media = await run_blocking("ytdlp", get_media_data, url)
         if media:
             # PLAY THE PLAYER
             try:
@@ -510,16 +654,16 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
                 
                 # UNLOAD PREVIOUS MEDIA IF ANY
                 player_instance = None
-                control_playerctl("--player=spotify,firefox,mpd stop")
+                await control_playerctl("--player=spotify,firefox,mpd stop")
                 
-                player_instance = MPVMediaPlayer(media.get("webpage_url"))
+                player_instance = await start_mpv_player(media.get("webpage_url"), info=media, started_at=request_started)
                 
                 player_info.volume = player_instance.get_volume()
                 
                 player_type = "mpv"
                 
                 
-                player_instance.play()
+                await run_blocking("player", player_instance.play)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Failed to play media: {str(e)}")
             
@@ -539,42 +683,10 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
         
     # SPOTIFY HANDLING
     elif "spotify.com" in url:
-        if not is_spotify_setup():
+        try:
+            sp = spotify_manager.client()
+        except SpotifyNotAuthenticated:
             raise HTTPException(status_code=403, detail="Spotify is not authenticated. Please visit /setup.")
-
-        auth = load_auth()
-        config = load_config()
-        
-        print("Loaded config and auth")
-        
-        if not config or not all(k in config for k in ("spotify_client_id", "spotify_client_secret", "spotify_redirect_uri")):
-            raise HTTPException(status_code=500, detail="Spotify configuration is missing or incomplete in config.yaml.")
-        
-        if auth and "access_token" in auth and "expires_at" in auth:
-            if auth["expires_at"] > int(time.time()):
-                sp = spotipy.Spotify(auth=auth["access_token"])
-            else:
-                sp_oauth = SpotifyOAuth(
-                    client_id=config["spotify_client_id"],
-                    client_secret=config["spotify_client_secret"],
-                    redirect_uri=config["spotify_redirect_uri"],
-                    scope=SPOTIFY_SCOPES,
-                    cache_path=AUTH_PATH
-                )
-                token_info = sp_oauth.refresh_access_token(auth["refresh_token"])
-                save_auth(token_info)
-                sp = spotipy.Spotify(auth=token_info["access_token"])
-        else:
-            sp_oauth = SpotifyOAuth(
-                client_id=config["spotify_client_id"],
-                client_secret=config["spotify_client_secret"],
-                redirect_uri=config["spotify_redirect_uri"],
-                scope=SPOTIFY_SCOPES,
-                cache_path=AUTH_PATH
-            )
-            token_info = sp_oauth.get_access_token(as_dict=True)
-            save_auth(token_info)
-            sp = spotipy.Spotify(auth=token_info["access_token"])
             
         print("Spotify API ready")
         
@@ -586,23 +698,24 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
         track_id = match.group(1)
         print(f"SPOTIFY TRACK ID: {track_id}")
         
-        if spotify_mode == "sp_client":
+        if config_store.get().spotify_mode == "sp_client":
             # Stop Any previous playing media
-            control_playerctl("--player=mpv,spotify,mpd,firefox stop")
+            await control_playerctl("--player=mpv,spotify,mpd,firefox stop")
             if player_instance is not None:
                 player_instance = None
             
             player_type = "spotify"
             # OPEN SPOTIFY via xdg-open
-            open_sp_client(track_id)
+            since = mpris_generation()
+            await open_sp_client(track_id)
             
-            player_info = get_playerctl_data(player=player_type)
+            player_info = await get_playerctl_data(player=player_type, changed_since=since)
             
             return player_info
         else:
             # HANDLING SPOTIFY PLAYBACK with YT-DLP
             try:
-                track = sp.track(track_id)
+                track = await run_blocking("spotify", sp.track, track_id)
                 print("Fetched track info from Spotify")
                 if not track:
                     raise HTTPException(status_code=404, detail="Could not retrieve Spotify track info")
@@ -615,7 +728,7 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
             
             print(f"Searching YouTube for: {search_query}")
             
-            yt_url = search_youtube_url(search_query)
+            yt_url = await run_blocking("ytdlp", search_youtube_url, search_query)
             
             print(f"yt_url: {yt_url}")
             
@@ -625,7 +738,7 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
             print(f"{title} - {artist}")
             url = yt_url
             # THEN CONTINUE TO YOUTUBE HANDLING
-            media = get_media_data(url)
+            media = await run_blocking("ytdlp", get_media_data, url)
             
             if yt_url and media:
                 # PLAY THE PLAYER
@@ -645,13 +758,13 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
                     
                     
                     # UNLOAD PREVIOUS MEDIA IF ANY
-                    control_playerctl("--player=spotify,firefox,mpd stop")
+                    await control_playerctl("--player=spotify,firefox,mpd stop")
                     player_instance = None
                     
-                    player_instance = MPVMediaPlayer(yt_url)
+                    player_instance = await start_mpv_player(yt_url, info=media, started_at=request_started)
                     
                     player_type = "mpv"
-                    player_instance.play()
+                    await run_blocking("player", player_instance.play)
                     
                     player_info.volume = player_instance.get_volume()
                     
@@ -676,16 +789,17 @@ def play_media(MediaData: Optional[MediaData] = Body(None)):
         raise HTTPException(status_code=400, detail="Unsupported media source. Only YouTube is supported at this time.")
     
     
-@app.post("/player/pause")
-def pause_player():
+@app.post("/player/pause", dependencies=[Depends(push_player_change)])
+async def pause_player():
     global player_info
     global player_type
     global player_instance
     
     
-    if control_mode == "mpris":
-        control_playerctl("pause", player=player_type)
-        player_info = get_playerctl_data(player=player_type)
+    if config_store.get().control_mode == "mpris":
+        since = mpris_generation()
+        await control_playerctl("pause", player=player_type)
+        player_info = await get_playerctl_data(player=player_type, changed_since=since)
         return player_info
     else:
         if player_instance is None:
@@ -697,31 +811,32 @@ def pause_player():
             
             player_info.volume = player_instance.get_volume()
             
-            player_instance.pause()
+            await run_blocking("player", player_instance.pause)
             
             return player_info
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to execute pause: {str(e)}")
 
-@app.post("/player/stop")
-def stop_player():
+@app.post("/player/stop", dependencies=[Depends(push_player_change)])
+async def stop_player():
     global player_info
     global player_type
     global player_instance
     
     
-    if control_mode == "mpris":
+    if config_store.get().control_mode == "mpris":
         player_type = ""
-        control_playerctl("--player=mpv,spotify,mpd,firefox  stop")
+        since = mpris_generation()
+        await control_playerctl("--player=mpv,spotify,mpd,firefox  stop")
         
         # NOTE: May need specific, but player is empty now.
-        player_info = get_playerctl_data()
+        player_info = await get_playerctl_data(changed_since=since)
         return player_info
     else:
         if player_instance is None:
             raise HTTPException(status_code=400, detail="No media is currently loaded")
         try:
-            player_instance.stop()
+            await run_blocking("player", player_instance.stop)
             player_instance = None  # Reset the player instance
             
             
@@ -733,9 +848,9 @@ def stop_player():
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to execute stop: {str(e)}")
     
-@app.post("/player/replay")
-def replay_player():
-    if control_mode == "mpris":
+@app.post("/player/replay", dependencies=[Depends(push_player_change)])
+async def replay_player():
+    if config_store.get().control_mode == "mpris":
         # control_playerctl("pause")
         return {"player_info": "TODO, pending application"}
     else:
@@ -756,8 +871,8 @@ def replay_player():
             
             
             
-            player_instance = MPVMediaPlayer(last_played_media.url)
-            player_instance.play()
+            player_instance = await start_mpv_player(last_played_media.url)
+            await run_blocking("player", player_instance.play)
             
             player_info.volume = player_instance.get_volume()
             
@@ -765,12 +880,12 @@ def replay_player():
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to execute replay: {str(e)}")
     
-@app.post("/player/volume")
-def set_volume(set: int = Query(..., ge=0, le=150, description="Volume percent (0-150)")):
+@app.post("/player/volume", dependencies=[Depends(push_player_change)])
+async def set_volume(set: int = Query(..., ge=0, le=150, description="Volume percent (0-150)")):
     global player_info
     global player_type
     
-    if control_mode == "mpris":
+    if config_store.get().control_mode == "mpris":
         # control_playerctl("pause")
         # convert the number into a decimal.
         if not (0 <= set <= 150):
@@ -778,8 +893,9 @@ def set_volume(set: int = Query(..., ge=0, le=150, description="Volume percent (
         
         scaled_vol = set / 100
 
-        control_playerctl(f"volume {scaled_vol}", player=player_type)
-        player_info = get_playerctl_data(player=player_type)
+        since = mpris_generation()
+        await control_playerctl(f"volume {scaled_vol}", player=player_type)
+        player_info = await get_playerctl_data(player=player_type, changed_since=since)
         return player_info
     else:
         global player_instance
@@ -789,29 +905,31 @@ def set_volume(set: int = Query(..., ge=0, le=150, description="Volume percent (
         if not (0 <= set <= 150):
             raise HTTPException(status_code=400, detail="Volume must be between 0 and 150")
         try:
-            player_instance._send_ipc_command({"command": ["set_property", "volume", set]})
-            player_info.volume = player_instance.get_volume()
+            await run_blocking("player", player_instance._send_ipc_command, {"command": ["set_property", "volume", set]})
+            # Read it back: the observed snapshot only updates after the property-change event
+            volume = (await run_blocking("player", player_instance.get_properties, "volume"))["volume"]
+            player_info.volume = int(volume) if volume is not None else set
             # return {"status": f"Volume set to {set}%"}
             return player_info
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to set volume: {str(e)}")
 
-@app.post("/player/next")
-def player_next():
+@app.post("/player/next", dependencies=[Depends(push_player_change)])
+async def player_next():
     global player_type
-    if control_mode == "mpris":
-        control_playerctl("next", player=player_type)
+    if config_store.get().control_mode == "mpris":
+        await control_playerctl("next", player=player_type)
         return {
             "message": "player next"
         }
     else:
         raise HTTPException(status_code=501, detail="method only available in MPRIS mode")
     
-@app.post("/player/previous")
-def player_previous():
+@app.post("/player/previous", dependencies=[Depends(push_player_change)])
+async def player_previous():
     global player_type
-    if control_mode == "mpris":
-        control_playerctl("previous", player=player_type)
+    if config_store.get().control_mode == "mpris":
+        await control_playerctl("previous", player=player_type)
         return {
             "message": "player previous"
         }
@@ -822,25 +940,19 @@ def player_previous():
 @app.post("/setup")
 @app.get("/setup")
 def setup():
-    config = load_config()
-    client_id = config.get('spotify_client_id', 'NOT SET') if config else 'NOT SET'
-    client_secret_status = 'SET' if config and config.get('spotify_client_secret') else 'NOT SET'
+    config = config_store.get()
+    client_id = config.spotify_client_id or 'NOT SET'
+    client_secret_status = 'SET' if config.spotify_client_secret else 'NOT SET'
     lan_ip = get_lan_ip()
     html = render_spotify_setup_page(client_id, client_secret_status, lan_ip)
     return HTMLResponse(content=html)
 
 @app.get("/auth/spotify")
 def auth_spotify():
-    config = load_config()
-    if not config or not all(k in config for k in ("spotify_client_id", "spotify_client_secret", "spotify_redirect_uri")):
-        return HTMLResponse("<h3>Spotify configuration is missing or incomplete in config.yaml.</h3>", status_code=500)
-    sp_oauth = SpotifyOAuth(
-        client_id=config["spotify_client_id"],
-        client_secret=config["spotify_client_secret"],
-        redirect_uri=config["spotify_redirect_uri"],
-        scope=SPOTIFY_SCOPES,  # <-- use the correct scopes here
-        cache_path=AUTH_PATH
-    )
+    try:
+        sp_oauth = spotify_manager.oauth()
+    except ValueError as e:
+        return HTMLResponse(f"<h3>{e}</h3>", status_code=500)
     auth_url = sp_oauth.get_authorize_url()
     return RedirectResponse(auth_url)
 
@@ -848,13 +960,13 @@ def auth_spotify():
 
 @app.get("/tasks/fetch_spotify_songs")
 def get_spotify_songs():
-    init_spotify_db()
     # If DB is empty, fetch from Spotify and save
     songs = get_songs_from_db()
     if not songs:
         try:
-            songs = fetch_liked_songs_from_spotify()
-            save_songs_to_db(songs)
+            sync_liked_songs_from_spotify(full=True)
+            songs = get_songs_from_db()
+            search_index.refresh_in_background("spotify")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to fetch from Spotify: {e}")
     return songs
@@ -862,14 +974,21 @@ def get_spotify_songs():
 # -------------------------------------------- TASKS ------------------------------------------------------------------------ #
 
 @app.post("/sync/spotify")
-def sync_spotify_songs():
+def sync_spotify_songs(
+    full: bool = Query(False, description="Re-fetch the whole library instead of only newly liked songs"),
+):
     """
-    Manually fetch liked songs from Spotify and update the local database.
+    Fetch liked songs from Spotify and update the local database.
+    Only songs liked since the last sync are fetched, unless a full sync is
+    requested or needed to pick up removals.
     """
     try:
-        songs = fetch_liked_songs_from_spotify()
-        save_songs_to_db(songs)
-        return {"status": "success", "synced_count": len(songs)}
+        result = sync_liked_songs_from_spotify(full=full)
+        if result["added"] or result["updated"] or result["removed"]:
+            search_index.refresh_in_background("spotify")
+        return {"status": "success", **result}
+    except SpotifyNotAuthenticated as e:
+        raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to sync from Spotify: {e}")
 
@@ -879,24 +998,17 @@ def spotify_callback(request: Request):
     if not code:
         return HTMLResponse("<h3>No authorization code received.</h3>", status_code=400)
 
-    config = load_config()
-    if not config or not all(k in config for k in ("spotify_client_id", "spotify_client_secret", "spotify_redirect_uri")):
-        return HTMLResponse("<h3>Spotify configuration is missing or incomplete in config.yaml.</h3>", status_code=500)
-
-    sp_oauth = SpotifyOAuth(
-        client_id=config["spotify_client_id"],
-        client_secret=config["spotify_client_secret"],
-        redirect_uri=config["spotify_redirect_uri"],
-        scope=SPOTIFY_SCOPES,
-        cache_path=AUTH_PATH
-    )
+    try:
+        sp_oauth = spotify_manager.oauth()
+    except ValueError as e:
+        return HTMLResponse(f"<h3>{e}</h3>", status_code=500)
 
     try:
         token_info = sp_oauth.get_access_token(code, as_dict=True)
         if not token_info:
             return HTMLResponse("<h3>Failed to get access token from Spotify.</h3>", status_code=400)
 
-        save_auth(token_info)
+        spotify_manager.set_token(token_info)
 
         access_token = token_info.get("access_token")
         refresh_token = token_info.get("refresh_token")
@@ -988,7 +1100,7 @@ def _get_thumbnail_url(video_data: dict) -> Optional[str]:
 # --- API Endpoint ---
 
 @app.get("/youtube", summary="Get YouTube video, playlist, or search results")
-def yt_feed(
+async def yt_feed(
     search: str = Query(..., description="Search term or YouTube video/playlist URL"),
     page: int = Query(1, ge=1, description="Page number for pagination (for search only)"),
     per_page: int = Query(25, ge=1, le=50, description="Results per page (max 50)")
@@ -1003,9 +1115,7 @@ def yt_feed(
     try:
         if content_type == "video":
             # Get full metadata for a YouTube video
-            command = ["yt-dlp", "--dump-json", search]
-            output = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            data = json.loads(output)
+            data = await run_blocking("ytdlp", fetch_youtube_info, search)
             
             return {
                 "type": "video",
@@ -1021,19 +1131,18 @@ def yt_feed(
                 "is_live": data.get("is_live", False)
             }
         elif content_type == "playlist":
-            # Get list of videos in playlist (limited metadata using --flat-playlist)
-            # --flat-playlist provides less detail but is faster for large playlists
-            command = ["yt-dlp", "--flat-playlist", "--dump-json", search]
-            output = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            videos = [json.loads(line) for line in output.strip().split("\n") if line.strip()]
+            # Get list of videos in playlist (limited metadata using flat extraction)
+            # flat extraction provides less detail but is faster for large playlists
+            playlist = await run_blocking("ytdlp", ytdlp_extractor.extract, search, flat=True)
+            videos = list(playlist.get("entries") or [])
 
             # Optional: Fetch full details for each video in playlist if needed
             # This would make the response much slower for large playlists
-            # For this example, we stick to --flat-playlist output
+            # For this example, we stick to the flat output
             
             results = []
             for v in videos:
-                # Some videos in --flat-playlist output might be placeholders or unavailable
+                # Some videos in flat output might be placeholders or unavailable
                 if v.get("_type") == "url" and v.get("id"):
                     results.append({
                         "title": v.get("title"),
@@ -1050,22 +1159,15 @@ def yt_feed(
             
             return {
                 "type": "playlist",
-                "total_videos": len(videos), # Total from --flat-playlist
+                "total_videos": len(videos), # Total from flat extraction
                 "results": results # Filtered/processed results
             }
         else:
             # Perform a fuzzy search
             # ytsearch<num>: means 'search and return num results'.
             # We fetch more than per_page to allow for pagination on our end.
-            # Using --flat-playlist for search results for speed.
-            command = [
-                "yt-dlp",
-                f"ytsearch{page * per_page + 10}:{search}", # Fetch a few more to be safe for pagination
-                "--flat-playlist",
-                "--dump-json"
-            ]
-            result = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            videos = [json.loads(line) for line in result.strip().split("\n") if line.strip()]
+            # Using flat extraction for search results for speed.
+            videos = await run_blocking("ytdlp", ytdlp_extractor.search, search, page * per_page + 10) # Fetch a few more to be safe for pagination
             
             start = (page - 1) * per_page
             end = start + per_page
@@ -1097,12 +1199,8 @@ def yt_feed(
                 "results": processed_paginated_videos,
                 "total_found": len(videos) # Total found by yt-dlp before pagination
             }
-    except subprocess.CalledProcessError as e:
-        # Capture stdout and stderr from yt-dlp for better debugging
-        error_output = e.stderr if e.stderr else "No stderr output"
-        return {"error": "yt-dlp failed", "detail": f"Command: {' '.join(e.cmd)}\nExit Code: {e.returncode}\nStderr: {error_output}"}
-    except json.JSONDecodeError as e:
-        return {"error": "Failed to parse yt-dlp output", "detail": str(e)}
+    except ExtractionError as e:
+        return {"error": "yt-dlp failed", "detail": str(e)}
     except Exception as e:
         return {"error": "Unexpected error", "detail": str(e)}
 
@@ -1113,79 +1211,88 @@ def yt_feed(
 
 
 @app.get("/songs")
-def list_songs():
+async def list_songs(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size. Omit to get the whole library."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    sort: str = Query("path", description="path, artist, album, title or added"),
+    order: str = Query("asc", description="asc or desc"),
+    artist: Optional[str] = Query(None, description="Exact artist (case-insensitive)"),
+    album: Optional[str] = Query(None, description="Exact album (case-insensitive)"),
+    min_duration: Optional[int] = Query(None, ge=0, description="Minimum duration in seconds"),
+    max_duration: Optional[int] = Query(None, ge=0, description="Maximum duration in seconds"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. file,title,artist"),
+):
+    """
+    List the local library, served from the persistent index (see library.py).
+    """
     try:
-        output = subprocess.check_output([
-            "mpc", "-h", "127.0.0.1", "-p", "6601",
-            "--format", "%file%|%title%|%artist%|%album%|%track%|%time%",
-            "listall"
-        ], text=True)
-    except subprocess.CalledProcessError as e:
-        return {"error": "Failed to query MPD", "details": str(e)}
-
-    project_dir = Path(__file__).resolve().parent
-    music_dir = (project_dir / "Music").resolve()
-    songs = []
-
-    for line in output.strip().split("\n"):
-        if not line.strip():
-            continue
-
-        parts = (line.split("|") + [""] * 6)[:6]
-        file_rel, title, artist, album, track, time_str = parts
-        file_path = music_dir / file_rel
-
-        # Fallback title
-        title = title or Path(file_rel).stem
-
-        # Get file size
-        try:
-            size_bytes = file_path.stat().st_size
-        except FileNotFoundError:
-            size_bytes = None
+        return await run_blocking(
+            "library",
+            library_index.query,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            artist=artist,
+            album=album,
+            min_duration=min_duration,
+            max_duration=max_duration,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Read metadata using Mutagen
-        duration = None
-        try:
-            audio = MutagenFile(file_path, easy=True)
-            if audio:
-                metadata = audio.tags or {}
-
-                artist = metadata.get('artist', [artist])[0] or None
-                album = metadata.get('album', [album])[0] or None
-                title = metadata.get('title', [title])[0] or title
-                track = metadata.get('tracknumber', [track])[0] or None
-
-                if hasattr(audio.info, 'length'):
-                    duration = int(audio.info.length)
-        except Exception:
-            # fallback to MPD's time
-            duration = int(time_str) if time_str.isdigit() else None
-
-        songs.append({
-            "file": file_rel,
-            "title": title,
-            "artist": artist,
-            "album": album,
-            "track": track,
-            "duration": duration,
-            "size_bytes": size_bytes,
-            "size_mb": round(size_bytes / (1024 * 1024), 2) if size_bytes else None
-        })
-
-    return {"songs": songs}
+@app.post("/songs/rescan")
+def rescan_songs():
+    """
+    Trigger an incremental library rescan in the background.
+    """
+    library_index.scan_in_background()
+    return {"status": "Rescan started", "last_scan": library_index.last_scan}
+
+@app.get("/search")
+def search_songs(
+    q: str = Query(..., min_length=1, description="Search text (prefix matching, typo tolerant)"),
+    limit: int = Query(20, ge=1, le=100),
+    source: Optional[str] = Query(None, description="Comma-separated sources: local, spotify, liked"),
+):
+    """
+    Search the local library, Spotify liked songs and liked songs in one indexed query.
+    """
+    sources = [s.strip() for s in source.split(",") if s.strip()] if source else None
+    if sources and any(s not in SEARCH_SOURCES for s in sources):
+        raise HTTPException(status_code=400, detail=f"source must be among: {', '.join(SEARCH_SOURCES)}")
+    return {"query": q, "results": search_index.search(q, limit=limit, sources=sources)}
 
 @app.get("/songs/spotify")
-def get_spotify_saved_songs():
-    from functions import get_songs_from_db
-    songs = get_songs_from_db()
-    if not songs:
-        return {"message": "No Spotify songs found in the database.", "songs": []}
-    return {"songs": songs}
+def get_spotify_saved_songs(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size. Omit to get every song."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    sort: str = Query("added", description="added, name or artist"),
+    order: str = Query("desc", description="asc or desc"),
+    artist: Optional[str] = Query(None, description="Exact artist (case-insensitive)"),
+):
+    # The version changes whenever a sync changes the table, so clients can revalidate cheaply
+    etag = f'"spotify-songs-{get_songs_version()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    try:
+        page = query_songs_from_db(sort=sort, order=order, limit=limit, cursor=cursor, artist=artist)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page["songs"] and not cursor:
+        return {"message": "No Spotify songs found in the database.", **page}
+    return page
 
 
 @app.get("/album_art")
-def album_art():
+async def album_art(
+    request: Request,
+    size: Optional[int] = Query(None, ge=16, le=2048, description="Fit the image within size x size pixels"),
+):
     global player_type
 
     valid_states_by_player = {
@@ -1197,49 +1304,40 @@ def album_art():
     valid_states = valid_states_by_player.get(player_type, [])
 
     try:
-        status = subprocess.check_output(
-            ["playerctl", "--player=" + player_type, "status"],
-            text=True
-        ).strip().lower()
+        props = None
+        if mpris_client.available:
+            try:
+                props = await run_blocking("player", mpris_client.get_all, player_type or None) or {}
+            except Exception as e:
+                print(f"⚠️ MPRIS read failed, falling back to playerctl: {e}")
+
+        if props is not None:
+            status = props.get("PlaybackStatus", "Stopped").lower()
+            url = props.get("Metadata", {}).get("mpris:artUrl", "")
+        else:
+            status = (await run_command(["playerctl", "--player=" + player_type, "status"])).lower()
+            url = None
         print(f"{player_type} status: {status}")
 
         if status not in valid_states:
             return {"error": f"{player_type} not in a valid state"}
 
-        url = subprocess.check_output(
-            ["playerctl", "--player=" + player_type, "metadata", "mpris:artUrl"],
-            text=True
-        ).strip()
+        if url is None:
+            url = await run_command(["playerctl", "--player=" + player_type, "metadata", "mpris:artUrl"])
         print(f"{player_type} artUrl: {url}")
 
-        if url.startswith("file://"):
-            parsed = urlparse(url)
-            local_path = Path(unquote(parsed.path))
-            print(f"Trying local path: {local_path}")
-
-            if not local_path.exists():
-                return {"error": "File not found at local path"}
-
-            mime = "image/jpeg"
-            if local_path.suffix.lower() == ".png":
-                mime = "image/png"
-
-            return Response(content=local_path.read_bytes(), media_type=mime)
-
-        elif url.startswith("http"):
-            print(f"Downloading remote image from: {url}")
-            response = requests.get(url, timeout=5)
-
-            if response.status_code != 200:
-                return {"error": f"HTTP request failed with status: {response.status_code}"}
-
-            mime = response.headers.get("Content-Type", "image/jpeg")
-            return Response(content=response.content, media_type=mime)
+        try:
+            content, mime, etag = await run_blocking("art", album_art_cache.get, url, size)
+        except ArtUnavailable as e:
+            return {"error": str(e)}
 
-        else:
-            return {"error": f"Unrecognized art URL format: {url}"}
+        # Revalidate on every poll (the track may change), but answer 304 when unchanged
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=content, media_type=mime, headers=headers)
 
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print(f"{player_type} command failed: {e}")
         return {"error": f"{player_type} command failed: {e}"}
     except Exception as e:
@@ -1247,12 +1345,22 @@ def album_art():
         return {"error": f"Unexpected error for {player_type}: {e}"}
 
 @app.get("/liked_songs")
-def liked_songs_get():
-    init_liked_songs_db()
-    songs = get_all_liked_songs()
-    if not songs:
-        return {"message": "No liked songs found.", "liked_songs": []}
-    return {"liked_songs": songs}
+def liked_songs_get(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size. Omit to get every liked song."),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page"),
+    sort: str = Query("added", description="added, name or artist"),
+    order: str = Query("desc", description="asc or desc"),
+    type: Optional[str] = Query(None, description="youtube, spotify or mpd"),
+    artist: Optional[str] = Query(None, description="Exact artist (case-insensitive)"),
+):
+    try:
+        page = query_liked_songs(sort=sort, order=order, limit=limit, cursor=cursor, song_type=type, artist=artist)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = {"liked_songs": page["songs"], "next_cursor": page["next_cursor"], "total": page["total"]}
+    if not page["songs"] and not cursor:
+        result["message"] = "No liked songs found."
+    return result
 
 @app.post("/liked_songs")
 async def liked_songs_post(
@@ -1261,18 +1369,8 @@ async def liked_songs_post(
     url: Optional[str] = Body(None, embed=True),
     image: UploadFile = File(None)
 ):
-    init_liked_songs_db()
-    # Determine type
-    if url:
-        if "youtube.com" in url or "youtu.be" in url:
-            song_type = "youtube"
-        elif "spotify.com" in url:
-            song_type = "spotify"
-        else:
-            song_type = "mpd"
-    else:
-        song_type = "mpd"
-        url = ""
+    song_type = liked_song_type(url)
+    url = url or ""
 
     # Handle image upload
     cover_art_url = ""
@@ -1286,39 +1384,24 @@ async def liked_songs_post(
 
     # Save to DB (update your add_liked_song to accept artist and cover_art_url)
     song = add_liked_song(song_name, url, song_type, artist, cover_art_url)
+    if song["status"] == "added":
+        search_index.refresh_in_background("liked")
     return {"message": "Song added to liked songs.", "song": song}
 
-def run_spotdl(cmd):
-    subprocess.run(cmd)
-
-def run_spotdl_download(url: str, music_dir: Path):
+@app.post("/liked_songs/import")
+def liked_songs_import(data: LikedSongsImport):
     """
-    Runs spotdl (optionally via uv tool run) to download a Spotify track.
-    Logs output and errors.
+    Add many liked songs in one transaction. Songs already liked (same title
+    and artist, ignoring case) are skipped.
     """
-    # If you use 'uv tool run spotdl', set this:
-    # cmd = ["uv", "tool", "run", "spotdl", url, "--output", str(music_dir)]
-    # If you use spotdl directly, set this:
-    cmd = ["spotdl", url, "--output", str(music_dir)]
-    print(f"🎵 Downloading: {url}")
-    try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        if result.returncode != 0:
-            print(f"⚠️ Error downloading {url}:\n{result.stderr}")
-        else:
-            print(f"✅ Downloaded: {url}")
-    except FileNotFoundError:
-        print("❌ spotdl is not found in PATH. Make sure spotdl is installed.")
+    result = import_liked_songs([song.model_dump() for song in data.songs])
+    if result["added"]:
+        search_index.refresh_in_background("liked")
+    return {"message": f"Imported {result['added']} liked songs.", **result}
 
 @app.post("/download")
 def download_song(
     url: str = Body(..., embed=True),
-    background_tasks: BackgroundTasks = None
 ):
     if not url:
         return {"error": "No URL provided."}
@@ -1326,16 +1409,55 @@ def download_song(
     print(f"Music Directory: {MUSIC_DIR}")
 
     if "spotify.com" in url:
-        # You can switch to 'uv tool run spotdl' if needed by editing run_spotdl_download
-        background_tasks.add_task(run_spotdl_download, url, MUSIC_DIR)
-        return {"status": "Downloading Spotify song in background...", "url": url}
+        # Playlists and albums are expanded into one job per track
+        # You can switch to 'uv tool run spotdl' by editing SpotDLRunner._command
+        job, created = spotdl_runner.add_to_queue(url)
+        if not created:
+            return {"status": f"Already {job.state}.", "url": url, "job": job.to_dict()}
+        return {"status": "Downloading Spotify song in background...", "url": url, "job": job.to_dict()}
 
     elif "youtube.com" in url or "youtu.be" in url:
         try:
-            yt_downloader.add_to_queue(url)
-            return {"status": "Downloading YouTube audio...", "url": url}
+            job, created = yt_downloader.add_to_queue(url)
+            if not created:
+                return {"status": f"Already {job.state}.", "url": url, "job": job.to_dict()}
+            return {"status": "Downloading YouTube audio...", "url": url, "job": job.to_dict()}
         except Exception as e:
             return {"error": f"Failed to start YouTube download: {e}"}
 
     else:
-        return {"error": "Unsupported URL. Only YouTube and Spotify links are supported."}
\ No newline at end of file
+        return {"error": "Unsupported URL. Only YouTube and Spotify links are supported."}
+
+
+@app.get("/downloads")
+def list_downloads(
+    state: Optional[str] = Query(None, description="Only jobs in this state, e.g. queued, downloading, completed"),
+    parent_id: Optional[str] = Query(None, description="Only the tracks expanded from this playlist/album job"),
+):
+    """
+    List download jobs, oldest first.
+    """
+    jobs = job_registry.list(state)
+    if parent_id:
+        jobs = [job for job in jobs if job.parent_id == parent_id]
+    return {"jobs": [job.to_dict() for job in jobs]}
+
+
+@app.get("/downloads/{job_id}")
+def get_download(job_id: str):
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Download job not found: '{job_id}'")
+    return job.to_dict()
+
+
+@app.post("/downloads/{job_id}/cancel")
+def cancel_download(job_id: str):
+    """
+    Cancel a queued or running download. Running downloads stop at their next progress update.
+    Cancelling a playlist or album also cancels the track downloads queued from it.
+    """
+    job = job_registry.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Download job not found: '{job_id}'")
+    return job.to_dict()
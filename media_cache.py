@@ -0,0 +1,188 @@
+"""
+Two-tier cache for yt-dlp info dicts, keyed by YouTube video ID.
+
+Tier one is an in-memory LRU, tier two a SQLite table so entries survive
+restarts. Live streams get a short TTL (their state changes quickly),
+regular videos a long one.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from constants import METADATA_CACHE_DB_PATH
+from extractor import ytdlp_extractor
+from functions import extract_youtube_id
+
+MEMORY_ENTRIES = 64
+VOD_TTL = 6 * 60 * 60  # seconds
+LIVE_TTL = 60  # seconds
+
+
+def _is_live(info: dict) -> bool:
+    return bool(info.get("is_live")) or info.get("live_status") in ("is_live", "is_upcoming")
+
+
+class MetadataCache:
+    def __init__(self, db_path: str = METADATA_CACHE_DB_PATH, max_entries: int = MEMORY_ENTRIES,
+                 vod_ttl: float = VOD_TTL, live_ttl: float = LIVE_TTL):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.vod_ttl = vod_ttl
+        self.live_ttl = live_ttl
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_metadata (
+                video_id TEXT PRIMARY KEY,
+                info TEXT,
+                is_live INTEGER,
+                fetched_at REAL,
+                expires_at REAL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def _remember(self, video_id: str, expires_at: float, info: dict):
+        with self._lock:
+            self._memory[video_id] = (expires_at, info)
+            self._memory.move_to_end(video_id)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, video_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(video_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(video_id)
+                    return entry[1]
+                del self._memory[video_id]
+
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT info, expires_at FROM media_metadata WHERE video_id = ? AND expires_at > ?",
+            (video_id, now)
+        ).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        info = json.loads(row[0])
+        self._remember(video_id, row[1], info)
+        return info
+
+    def put(self, video_id: str, info: dict):
+        now = time.time()
+        is_live = _is_live(info)
+        expires_at = now + (self.live_ttl if is_live else self.vod_ttl)
+        self._remember(video_id, expires_at, info)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO media_metadata (video_id, info, is_live, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (video_id, json.dumps(info), int(is_live), now, expires_at)
+        )
+        conn.execute("DELETE FROM media_metadata WHERE expires_at <= ?", (now,))
+        conn.commit()
+        conn.close()
+
+
+metadata_cache = MetadataCache()
+
+
+def fetch_youtube_info(url: str, timeout: Optional[float] = None, refresh: bool = False) -> dict:
+    """
+    Return the yt-dlp info dict for a YouTube URL, extracting it only on a cache miss
+    (or always, with `refresh=True`).
+    Raises extractor.ExtractionError if extraction fails.
+    """
+    video_id = extract_youtube_id(url)
+    if video_id and not refresh:
+        cached = metadata_cache.get(video_id)
+        if cached is not None:
+            return cached
+
+    info = ytdlp_extractor.extract(url, timeout=timeout)
+    video_id = video_id or info.get("id")
+    if video_id:
+        metadata_cache.put(video_id, info)
+    return info
+
+
+# ----------------------------- Direct audio stream URLs ----------------------------- #
+
+STREAM_EXPIRY_MARGIN = 120  # seconds; don't hand mpv a URL that is about to expire
+STREAM_DEFAULT_TTL = 60 * 60  # used when the URL carries no `expire` parameter
+
+_stream_cache: dict[str, dict] = {}
+_stream_lock = threading.Lock()
+
+
+def _stream_expiry(stream_url: str) -> float:
+    """googlevideo URLs carry their expiry as a unix timestamp in `expire`."""
+    expire = parse_qs(urlparse(stream_url).query).get("expire")
+    if expire and expire[0].isdigit():
+        return float(expire[0])
+    return time.time() + STREAM_DEFAULT_TTL
+
+
+def _pick_audio_format(info: dict) -> Optional[dict]:
+    """Best audio-only format, preferring plain HTTP(S) over manifest protocols."""
+    candidates = [
+        f for f in info.get("formats") or []
+        if f.get("url") and f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+    ]
+    if not candidates:
+        return None
+    return max(
+        candidates,
+        key=lambda f: (f.get("protocol") in ("https", "http"), f.get("abr") or f.get("tbr") or 0)
+    )
+
+
+def resolve_audio_stream(url: str) -> Optional[dict]:
+    """
+    Resolve a YouTube URL to its best direct audio stream.
+    Returns {"url", "http_headers", "expires_at", "title"} or None when no
+    audio-only format exists (mpv should then be given the page URL).
+    """
+    video_id = extract_youtube_id(url)
+    now = time.time()
+    if video_id:
+        with _stream_lock:
+            cached = _stream_cache.get(video_id)
+        if cached and cached["expires_at"] - STREAM_EXPIRY_MARGIN > now:
+            return cached
+
+    info = fetch_youtube_info(url)
+    fmt = _pick_audio_format(info)
+    if fmt is not None and _stream_expiry(fmt["url"]) - STREAM_EXPIRY_MARGIN <= now:
+        # Cached info dict outlived its signed URLs; extract again
+        info = fetch_youtube_info(url, refresh=True)
+        fmt = _pick_audio_format(info)
+    if fmt is None:
+        return None
+
+    stream = {
+        "url": fmt["url"],
+        "http_headers": fmt.get("http_headers") or info.get("http_headers") or {},
+        "expires_at": _stream_expiry(fmt["url"]),
+        "title": info.get("title"),
+    }
+    video_id = video_id or info.get("id")
+    if video_id:
+        with _stream_lock:
+            _stream_cache[video_id] = stream
+            for key in [k for k, v in _stream_cache.items() if v["expires_at"] <= now]:
+                del _stream_cache[key]
+    return stream
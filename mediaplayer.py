@@ -5,46 +5,238 @@ import socket
 import time
 import uuid
 import threading
-from typing import Optional
+import itertools
+from typing import Optional, Any, Callable
+
+from media_cache import fetch_youtube_info
+
+
+class MPVIPCError(Exception):
+    """Raised when mpv rejects an IPC command or the connection is lost."""
+
+
+class MPVIPCClient:
+    """
+    Single long-lived connection to mpv's JSON IPC socket.
+
+    A reader thread consumes newline-delimited replies and matches them to the
+    waiting caller by `request_id`, so several commands can be in flight at once
+    and event lines interleaved between replies are never mistaken for one.
+    Event lines are handed to the callbacks registered with `on_event`.
+    """
+
+    def __init__(self, ipc_path: str, timeout: float = 2.0):
+        self.ipc_path = ipc_path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._write_lock = threading.Lock()
+        self._pending: dict[int, dict] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._reader_thread: Optional[threading.Thread] = None
+        self._event_handlers: list[Callable[[dict], None]] = []
+        self._observe_ids = itertools.count(1)
+
+    def connect(self):
+        """Open the socket (if not already open) and start the reader thread."""
+        with self._write_lock:
+            if self._sock is not None:
+                return
+            sock = socket.socket(socket.AF_UNIX)
+            sock.connect(self.ipc_path)
+            self._sock = sock
+            self._reader_thread = threading.Thread(target=self._reader, args=(sock,), daemon=True)
+            self._reader_thread.start()
+
+    def close(self):
+        with self._write_lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self._fail_pending("IPC connection closed")
+
+    def _fail_pending(self, reason: str):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for slot in pending.values():
+            slot["error"] = reason
+            slot["event"].set()
+
+    def _reader(self, sock: socket.socket):
+        """Read replies line by line, handling fragmented and batched reads."""
+        try:
+            with sock.makefile("rb") as stream:
+                for line in stream:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        message = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"⚠️ Ignoring malformed IPC line: {line[:80]!r}")
+                        continue
+                    self._dispatch(message)
+        except OSError:
+            pass
+        finally:
+            with self._write_lock:
+                if self._sock is sock:
+                    self._sock = None
+            self._fail_pending("IPC connection lost")
+
+    def _dispatch(self, message: dict):
+        if "event" in message:
+            for handler in self._event_handlers:
+                try:
+                    handler(message)
+                except Exception as e:
+                    print(f"⚠️ IPC event handler failed: {e}")
+            return
+        request_id = message.get("request_id")
+        if request_id is None:
+            return
+        with self._pending_lock:
+            slot = self._pending.pop(request_id, None)
+        if slot is not None:
+            slot["reply"] = message
+            slot["event"].set()
+
+    def _submit(self, commands: list[list]) -> list[tuple[int, dict]]:
+        """Register and write every command in a single `sendall`."""
+        self.connect()
+        slots = []
+        lines = []
+        with self._pending_lock:
+            for args in commands:
+                request_id = next(self._request_ids)
+                slot = {"event": threading.Event(), "reply": None, "error": None}
+                self._pending[request_id] = slot
+                slots.append((request_id, slot))
+                lines.append(json.dumps({"command": args, "request_id": request_id}) + "\n")
+        try:
+            with self._write_lock:
+                if self._sock is None:
+                    raise MPVIPCError("IPC connection closed")
+                self._sock.sendall("".join(lines).encode("utf-8"))
+        except (OSError, MPVIPCError) as e:
+            with self._pending_lock:
+                for request_id, _ in slots:
+                    self._pending.pop(request_id, None)
+            raise MPVIPCError(f"Failed to send IPC command: {e}") from e
+        return slots
+
+    def _wait(self, request_id: int, slot: dict, timeout: Optional[float]) -> dict:
+        if not slot["event"].wait(self.timeout if timeout is None else timeout):
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise MPVIPCError(f"Timed out waiting for reply to request {request_id}")
+        if slot["error"]:
+            raise MPVIPCError(slot["error"])
+        return slot["reply"]
+
+    def command(self, *args, timeout: Optional[float] = None) -> Any:
+        """Run one command and return its `data`, raising MPVIPCError on failure."""
+        (request_id, slot), = self._submit([list(args)])
+        reply = self._wait(request_id, slot, timeout)
+        if reply.get("error") != "success":
+            raise MPVIPCError(f"{args[0]} failed: {reply.get('error')}")
+        return reply.get("data")
+
+    def on_event(self, handler: Callable[[dict], None]):
+        """
+        Register a callback for mpv event lines (e.g. `property-change`).
+        Handlers run on the reader thread, so they must not block on IPC replies.
+        """
+        self._event_handlers.append(handler)
+
+    def observe(self, *names: str):
+        """Subscribe to `property-change` events for each property."""
+        slots = self._submit([["observe_property", next(self._observe_ids), name] for name in names])
+        for request_id, slot in slots:
+            self._wait(request_id, slot, None)
+
+    def get_properties(self, *names: str, timeout: Optional[float] = None) -> dict[str, Any]:
+        """
+        Fetch several properties in one round trip.
+        Properties mpv cannot provide right now (e.g. `time-pos` while idle) map to None.
+        """
+        slots = self._submit([["get_property", name] for name in names])
+        values = {}
+        for name, (request_id, slot) in zip(names, slots):
+            reply = self._wait(request_id, slot, timeout)
+            values[name] = reply.get("data") if reply.get("error") == "success" else None
+        return values
+
 
 class MPVMediaPlayer:
-    def __init__(self, url):
+    MAX_CACHE = 1073741824  # 1GB in bytes
+
+    # Properties mirrored into `self.state` via observe_property events
+    OBSERVED_PROPERTIES = (
+        "time-pos",
+        "pause",
+        "volume",
+        "demuxer-cache-state",
+        "eof-reached",
+        "idle-active",
+    )
+
+    def __init__(self, url, info: Optional[dict] = None, stream: Optional[dict] = None,
+                 started_at: Optional[float] = None, fetch_info: bool = True):
+        """
+        `stream` is a pre-resolved direct audio URL (see media_cache.resolve_audio_stream);
+        when given, mpv plays it directly instead of running its own ytdl_hook extraction.
+        `started_at` (time.monotonic()) is the reference for the time-to-first-audio log.
+        Pass `fetch_info=False` when the caller already looked up (or gave up on) the metadata.
+        """
         if not url:
             raise ValueError("A valid URL must be provided to initialize MediaPlayerManager.")
 
         self.url = url
-        self.info = {}
+        self.info = info or {}
         self.ipc_path = f"/tmp/mpv_socket_{uuid.uuid4().hex[:8]}"  # Unique socket path
         self.process: 'Optional[subprocess.Popen]' = None
+        self.ipc = MPVIPCClient(self.ipc_path)
+        self.state: dict[str, Any] = {name: None for name in self.OBSERVED_PROPERTIES}
+        self._state_lock = threading.Lock()
+        self._stopping = False
+        self.ipc.on_event(self._on_event)
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.time_to_first_audio: Optional[float] = None
 
-        # Only fetch metadata if it's a YouTube link
-        if "youtube.com" in url or "youtu.be" in url:
+        # Only fetch metadata if it's a YouTube link (and the caller didn't pass it)
+        if fetch_info and not self.info and ("youtube.com" in url or "youtu.be" in url):
             print(f"🌍 URL: {url}")
             try:
-                result = subprocess.run(
-                    ['yt-dlp', '--dump-json', url],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                self.info = json.loads(result.stdout)
+                self.info = fetch_youtube_info(url)
                 print("Metadata loaded successfully.")
             except Exception as e:
                 print("Failed to fetch metadata:", e)
         
 
+        args = [
+            'mpv',
+            url,
+            '--no-terminal',
+            '--no-video',
+            '--force-window=no',
+            '--player-operation-mode=pseudo-gui',
+            f'--input-ipc-server={self.ipc_path}'
+        ]
+        if stream:
+            args[1] = stream["url"]
+            args += ['--ytdl=no', f'--force-media-title={stream.get("title") or url}']
+            # -append takes one header per option, so commas in values are safe
+            args += [f'--http-header-fields-append={k}: {v}' for k, v in stream.get("http_headers", {}).items()]
+
         # Start mpv with IPC enabled
         try:
-            self.process = subprocess.Popen([
-                'mpv',
-                url,
-                '--no-terminal',
-                '--no-video',
-                '--force-window=no',
-                '--player-operation-mode=pseudo-gui',
-                f'--input-ipc-server={self.ipc_path}'
-            ])
-            print(f"Started mpv with IPC at {self.ipc_path}")
+            self.process = subprocess.Popen(args)
+            print(f"Started mpv with IPC at {self.ipc_path} ({'direct stream' if stream else 'ytdl_hook'})")
 
             # Wait for the socket to appear
             for _ in range(20):
@@ -54,21 +246,33 @@ class MPVMediaPlayer:
             else:
                 raise RuntimeError("IPC socket not created in time.")
 
+            self.ipc.connect()
+            self.ipc.observe(*self.OBSERVED_PROPERTIES)
+            # Seed the snapshot so callers don't race the first property-change events
+            initial = self.ipc.get_properties(*self.OBSERVED_PROPERTIES)
+            with self._state_lock:
+                self.state.update(initial)
+            if initial.get("time-pos"):
+                self._mark_first_audio()
+
         except Exception as e:
             print("❌ Failed to start mpv:", e)
 
-        self._monitor_thread = threading.Thread(target=self._monitor_cache, daemon=True)
-        self._stop_monitor = threading.Event()
-        self._monitor_thread.start()
-
     def _send_ipc_command(self, command: dict):
-        """Send a command to the mpv IPC socket."""
+        """Send a command to the mpv IPC socket and return its reply data."""
         try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
+            return self.ipc.command(*command["command"])
         except Exception as e:
             print(f"⚠️ IPC command failed: {e}")
+            return None
+
+    def get_properties(self, *names: str) -> dict[str, Any]:
+        """Fetch several mpv properties in a single IPC round trip."""
+        try:
+            return self.ipc.get_properties(*names)
+        except Exception as e:
+            print(f"⚠️ Failed to get properties {names}: {e}")
+            return {name: None for name in names}
 
     def play(self):
         self._send_ipc_command({"command": ["set_property", "pause", False]})
@@ -79,57 +283,49 @@ class MPVMediaPlayer:
         print("⏸️ Paused playback.")
 
     def stop(self):
-        self._stop_monitor.set()
+        self._stopping = True
         self._send_ipc_command({"command": ["quit"]})
+        self.ipc.close()
         print("⏹️ Stopped playback.")
 
-    def _monitor_cache(self):
-        """Monitor mpv's cache size and stop if it exceeds 1GB."""
-        MAX_CACHE = 1073741824  # 1GB in bytes
-        while not self._stop_monitor.is_set():
-            try:
-                cache_size = self._get_cache_size()
-                paused = self._get_paused()
-                if cache_size is not None and cache_size > MAX_CACHE:
-                    print(f"⚠️ Cache size exceeded 1GB: {cache_size} bytes. Stopping player.")
-                    self.stop()
-                    break
-                if paused and cache_size is not None and cache_size > MAX_CACHE:
-                    print(f"⚠️ Cache size exceeded 1GB while paused: {cache_size} bytes. Stopping player.")
-                    self.stop()
-                    break
-            except Exception as e:
-                print(f"⚠️ Cache monitor error: {e}")
-            self._stop_monitor.wait(2)  # Check every 2 seconds
+    def _mark_first_audio(self):
+        if self.time_to_first_audio is None:
+            self.time_to_first_audio = time.monotonic() - self.started_at
+            print(f"⏱️ Time to first audio: {self.time_to_first_audio * 1000:.0f} ms")
+
+    def _on_event(self, message: dict):
+        """Mirror observed property changes into the in-memory state snapshot."""
+        if message.get("event") == "playback-restart":
+            self._mark_first_audio()
+            return
+        if message.get("event") != "property-change":
+            return
+        name = message.get("name")
+        data = message.get("data")
+        with self._state_lock:
+            self.state[name] = data
+
+        if name == "demuxer-cache-state" and data and not self._stopping:
+            cache_size = data.get("cache-size", 0)
+            if cache_size > self.MAX_CACHE:
+                print(f"⚠️ Cache size exceeded 1GB: {cache_size} bytes. Stopping player.")
+                # stop() waits for an IPC reply, which this reader thread delivers
+                self._stopping = True
+                threading.Thread(target=self.stop, daemon=True).start()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a copy of the last observed property values (no IPC)."""
+        with self._state_lock:
+            return dict(self.state)
 
     def _get_cache_size(self):
-        """Get the current cache size from mpv via IPC."""
-        try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                command = {"command": ["get_property", "demuxer-cache-state"]}
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
-                response = client.recv(4096)
-                result = json.loads(response.decode('utf-8'))
-                cache_state = result.get("data", {})
-                return cache_state.get("cache-size", 0)
-        except Exception as e:
-            print(f"⚠️ Failed to get cache size: {e}")
-            return None
+        """Get the current cache size from the observed state."""
+        cache_state = self.snapshot()["demuxer-cache-state"]
+        return cache_state.get("cache-size", 0) if cache_state else None
 
     def _get_paused(self):
-        """Check if mpv is paused via IPC."""
-        try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                command = {"command": ["get_property", "pause"]}
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
-                response = client.recv(1024)
-                result = json.loads(response.decode('utf-8'))
-                return result.get("data", False)
-        except Exception as e:
-            print(f"⚠️ Failed to get paused state: {e}")
-            return False
+        """Check if mpv is paused, from the observed state."""
+        return bool(self.snapshot()["pause"])
 
     # def get_state(self):
     #     return {
@@ -138,19 +334,7 @@ class MPVMediaPlayer:
     #         'duration': self.info.get('duration')
     #     }
     def get_state(self):
-        progress = None
-        try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                command = {"command": ["get_property", "time-pos"]}
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
-                
-                # Receive response
-                response = client.recv(1024)
-                result = json.loads(response.decode('utf-8'))
-                progress = result.get("data")
-        except Exception as e:
-            print(f"⚠️ Failed to get playback progress: {e}")
+        progress = self.get_progress()
         
         return {
             'title': self.info.get('title'),
@@ -165,31 +349,11 @@ class MPVMediaPlayer:
 
     def get_volume(self) -> Optional[float]:
         """Get the current volume level of mpv."""
-        try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                command = {"command": ["get_property", "volume"]}
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
-                response = client.makefile().readline()
-                result = json.loads(response)
-                return result.get("data")
-        except Exception as e:
-            print(f"⚠️ Failed to get volume: {e}")
-            return None
+        return self.snapshot()["volume"]
 
     def get_progress(self) -> Optional[float]:
         """Get the current playback position (in seconds) from mpv."""
-        try:
-            with socket.socket(socket.AF_UNIX) as client:
-                client.connect(self.ipc_path)
-                command = {"command": ["get_property", "time-pos"]}
-                client.sendall((json.dumps(command) + '\n').encode('utf-8'))
-                response = client.makefile().readline()
-                result = json.loads(response)
-                return result.get("data")
-        except Exception as e:
-            print(f"⚠️ Failed to get playback progress: {e}")
-            return None
+        return self.snapshot()["time-pos"]
 
 
 
@@ -0,0 +1,168 @@
+"""
+Minimal asyncio client for the MPD protocol, with a small connection pool.
+
+Replaces forking `mpc` for every command. Several commands can be sent as one
+`command_list_ok_begin` batch, so e.g. "clear + add + play" is one round trip.
+"""
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, Optional
+
+POOL_SIZE = 3
+CONNECT_TIMEOUT = 3  # seconds
+COMMAND_TIMEOUT = 10  # seconds
+
+
+class MPDError(Exception):
+    """An `ACK` reply from MPD, or a connection-level failure."""
+
+
+def _quote(arg) -> str:
+    arg = str(arg)
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _encode(command: list) -> bytes:
+    name, *args = command
+    return (" ".join([name, *(_quote(a) for a in args)]) + "\n").encode("utf-8")
+
+
+class MPDConnection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT
+        )
+        greeting = await self.reader.readline()
+        if not greeting.startswith(b"OK MPD"):
+            await self.close()
+            raise MPDError(f"Unexpected MPD greeting: {greeting!r}")
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            with contextlib.suppress(Exception):
+                await self.writer.wait_closed()
+        self.reader = self.writer = None
+
+    async def _read_line(self) -> str:
+        line = await self.reader.readline()
+        if not line:
+            raise MPDError("MPD closed the connection")
+        return line.decode("utf-8").rstrip("\n")
+
+    async def iter_pairs(self, command: list) -> AsyncIterator[tuple[str, str]]:
+        """Send one command and yield its `key: value` pairs as they arrive."""
+        self.writer.write(_encode(command))
+        await self.writer.drain()
+        while True:
+            line = await self._read_line()
+            if line == "OK":
+                return
+            if line.startswith("ACK "):
+                raise MPDError(line)
+            key, _, value = line.partition(": ")
+            yield key, value
+
+    async def command(self, *command) -> list[tuple[str, str]]:
+        return [pair async for pair in self.iter_pairs(list(command))]
+
+    async def command_list(self, commands: list[list]) -> list[list[tuple[str, str]]]:
+        """Run several commands in one round trip; returns one pair list per command."""
+        payload = b"command_list_ok_begin\n" + b"".join(_encode(c) for c in commands) + b"command_list_end\n"
+        self.writer.write(payload)
+        await self.writer.drain()
+        results: list[list[tuple[str, str]]] = [[]]
+        while True:
+            line = await self._read_line()
+            if line == "OK":
+                return results[:-1]
+            if line == "list_OK":
+                results.append([])
+                continue
+            if line.startswith("ACK "):
+                raise MPDError(line)
+            key, _, value = line.partition(": ")
+            results[-1].append((key, value))
+
+
+class MPDClientPool:
+    """
+    Up to `size` persistent connections to one MPD server. A connection that
+    fails mid-command is dropped and the command is retried once on a fresh one.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6600, size: int = POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        """Bind the pool to the running event loop (call from the app's lifespan)."""
+        self.loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.size)
+
+    async def close(self):
+        while self._idle is not None and not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[MPDConnection]:
+        async with self._slots:
+            conn = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.connected:
+                    conn = candidate
+                    break
+            if conn is None:
+                conn = MPDConnection(self.host, self.port)
+                await conn.connect()
+            reusable = False
+            try:
+                yield conn
+                reusable = True
+            except MPDError as e:
+                # A protocol error (ACK) leaves the connection usable; anything else doesn't
+                reusable = str(e).startswith("ACK ") and conn.connected
+                raise
+            finally:
+                if reusable:
+                    self._idle.put_nowait(conn)
+                else:
+                    await conn.close()
+
+    async def _with_retry(self, run):
+        for attempt in range(2):
+            try:
+                async with self.connection() as conn:
+                    return await asyncio.wait_for(run(conn), COMMAND_TIMEOUT)
+            except MPDError as e:
+                if str(e).startswith("ACK ") or attempt:
+                    raise
+                print(f"⚠️ MPD connection lost, reconnecting: {e}")
+            except (OSError, asyncio.TimeoutError) as e:
+                if attempt:
+                    raise MPDError(f"MPD unreachable: {e}") from e
+                print(f"⚠️ MPD connection lost, reconnecting: {e}")
+
+    async def execute(self, *command) -> list[tuple[str, str]]:
+        return await self._with_retry(lambda conn: conn.command(*command))
+
+    async def execute_list(self, commands: list[list]) -> list[list[tuple[str, str]]]:
+        return await self._with_retry(lambda conn: conn.command_list(commands))
+
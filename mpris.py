@@ -0,0 +1,166 @@
+"""
+Resident MPRIS client talking to the session bus directly (via jeepney),
+so reading player state does not need a `playerctl` process per property.
+"""
+
+import threading
+from queue import Queue
+from typing import Callable, Optional
+
+from jeepney import DBusAddress, MatchRule, Properties, message_bus
+from jeepney.io.threading import DBusRouter, Proxy, open_dbus_connection
+from jeepney.low_level import HeaderFields
+from jeepney.wrappers import unwrap_msg
+
+MPRIS_PREFIX = "org.mpris.MediaPlayer2."
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+
+
+def _unwrap(value):
+    """Strip jeepney's (signature, value) variant tuples recursively."""
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], str):
+        return _unwrap(value[1])
+    if isinstance(value, dict):
+        return {k: _unwrap(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unwrap(v) for v in value]
+    return value
+
+
+class MPRISClient:
+    """
+    One long-lived session bus connection shared by every request.
+
+    `get_all` reads a player's whole `Player` interface with a single
+    `GetAll` call. A listener thread counts `PropertiesChanged` signals
+    from non-ignored players, so a caller that just sent a control command
+    can block on `wait_for_change` until its player actually reports the
+    new state.
+    """
+
+    def __init__(self, ignore_players: str = "", timeout: float = 1.0):
+        self.ignore_players = [p.strip().lower() for p in ignore_players.split(",") if p.strip()]
+        self.timeout = timeout
+        self.router: Optional[DBusRouter] = None
+        self.bus: Optional[Proxy] = None
+        self.generation = 0
+        self._changed_at: dict[str, int] = {}  # player bus name -> generation of its last signal
+        self._owners: dict[str, Optional[str]] = {}  # sender unique name -> player bus name (None: not tracked)
+        self._changed = threading.Condition()
+        self._signals: Queue = Queue()
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def available(self) -> bool:
+        return self.router is not None
+
+    def start(self):
+        """Connect to the session bus and subscribe to MPRIS property changes."""
+        if self.router is not None:
+            return
+        router = DBusRouter(open_dbus_connection(bus="SESSION"))
+        rule = MatchRule(
+            type="signal",
+            interface="org.freedesktop.DBus.Properties",
+            member="PropertiesChanged",
+            path=MPRIS_PATH,
+        )
+        bus = Proxy(message_bus, router, timeout=self.timeout)
+        bus.AddMatch(rule)
+        router.filter(rule, queue=self._signals)
+        self.router = router
+        self.bus = bus
+        threading.Thread(target=self._listen, daemon=True).start()
+        print("✅ MPRIS client connected to session bus")
+
+    def close(self):
+        if self.router is not None:
+            self.router.close()
+            self.router = None
+            self.bus = None
+        self._signals.put(None)
+
+    def on_change(self, listener: Callable[[], None]):
+        """Call `listener()` (on the listener thread) for every PropertiesChanged signal from a non-ignored player."""
+        self._listeners.append(listener)
+
+    def _sender_player(self, sender: Optional[str]) -> Optional[str]:
+        """
+        Map a signal's sender (a unique name like `:1.42`) to the player's bus
+        name, or None for ignored players and anything that isn't a player.
+        """
+        if sender not in self._owners:
+            # A player we haven't seen yet (or one that restarted): rebuild the map
+            owners = {s: name for s, name in self._owners.items() if name is None}
+            for name in self._player_names():
+                try:
+                    owners[self.bus.GetNameOwner(name)[0]] = name
+                except Exception:
+                    continue
+            owners.setdefault(sender, None)
+            self._owners = owners
+        return self._owners[sender]
+
+    def _listen(self):
+        while True:
+            msg = self._signals.get()
+            if msg is None:
+                break
+            try:
+                player = self._sender_player(msg.header.fields.get(HeaderFields.sender))
+            except Exception:
+                player = None  # bus closed or unreachable
+            if player is None:
+                continue
+            with self._changed:
+                self.generation += 1
+                self._changed_at[player] = self.generation
+                self._changed.notify_all()
+            for listener in self._listeners:
+                listener()
+
+    def wait_for_change(self, since: int, timeout: float = 0.5, player: Optional[str] = None) -> bool:
+        """
+        Block until `player` (any non-ignored player if None) sends a
+        PropertiesChanged signal newer than `since`. Returns False if the
+        timeout expires first.
+        """
+        def changed():
+            return any(
+                generation > since and self._matches(name, player)
+                for name, generation in self._changed_at.items()
+            )
+        with self._changed:
+            return self._changed.wait_for(changed, timeout=timeout)
+
+    @staticmethod
+    def _matches(name: str, player: Optional[str]) -> bool:
+        """Whether bus name `name` is `player`, the way `playerctl --player=<name>` matches."""
+        if not player:
+            return True
+        wanted = MPRIS_PREFIX + player
+        return name == wanted or name.startswith(wanted + ".")
+
+    def _player_names(self) -> list[str]:
+        names = [n for n in self.bus.ListNames()[0] if n.startswith(MPRIS_PREFIX)]
+        return [
+            n for n in names
+            if not any(n[len(MPRIS_PREFIX):].lower().startswith(p) for p in self.ignore_players)
+        ]
+
+    def _resolve(self, player: Optional[str]) -> Optional[str]:
+        """Pick a bus name the way `playerctl --player=<name>` would."""
+        names = [n for n in self._player_names() if self._matches(n, player)]
+        return names[0] if names else None
+
+    def get_all(self, player: Optional[str] = None) -> Optional[dict]:
+        """Return every `Player` property (variants unwrapped), or None if no player matches."""
+        if self.router is None:
+            raise RuntimeError("MPRIS client is not connected")
+        name = self._resolve(player)
+        if name is None:
+            return None
+        address = DBusAddress(MPRIS_PATH, bus_name=name, interface=PLAYER_INTERFACE)
+        reply = self.router.send_and_get_reply(Properties(address).get_all(), timeout=self.timeout)
+        return _unwrap(unwrap_msg(reply)[0])
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination over SQLite tables.
+
+A page is ordered by a sort expression plus a unique key column as the
+tie-breaker; the cursor encodes the last row's (sort value, key), so the next
+page is an index range scan instead of an OFFSET that re-reads earlier rows.
+"""
+
+import base64
+import json
+import sqlite3
+from typing import Any, Optional
+
+
+def encode_cursor(sort_value: Any, key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, key]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Any, Any]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        sort_value, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return sort_value, key
+
+
+def keyset_page(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: str,
+    sort_expr: str,
+    key_column: str,
+    order: str = "asc",
+    filters: Optional[list[tuple[str, Any]]] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> tuple[list[sqlite3.Row], Optional[str], Optional[int]]:
+    """
+    Return (rows, next_cursor, total) for one page. `filters` are
+    (SQL condition, parameter) pairs ANDed together. `total` is only counted
+    for the first page (no cursor). Raises ValueError on bad arguments.
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    where = [sql for sql, _ in filters or []]
+    params = [param for _, param in filters or []]
+    filter_sql = " AND ".join(where)
+    filter_params = list(params)
+
+    if cursor:
+        after_value, after_key = decode_cursor(cursor)
+        where.append(f"({sort_expr}, {key_column}) {'>' if order == 'asc' else '<'} (?, ?)")
+        params += [after_value, after_key]
+
+    direction = "ASC" if order == "asc" else "DESC"
+    sql = (
+        f"SELECT {sort_expr} AS sort_key, {key_column} AS page_key, {columns} "
+        f"FROM {table} {'WHERE ' + ' AND '.join(where) if where else ''} "
+        f"ORDER BY {sort_expr} {direction}, {key_column} {direction}"
+    )
+    if limit is not None:
+        # One extra row tells us whether another page exists
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    previous_factory = conn.row_factory
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        total = None
+        if not cursor:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM {table} {'WHERE ' + filter_sql if filter_sql else ''}", filter_params
+            ).fetchone()[0]
+    finally:
+        conn.row_factory = previous_factory
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["sort_key"], rows[-1]["page_key"])
+    return rows, next_cursor, total
@@ -0,0 +1,116 @@
+"""
+Push channel for player state.
+
+A single poller reads the player state and broadcasts what changed to every
+subscriber, so any number of remotes on /player/events cost the same backend
+work as one. It only runs while someone is subscribed, ticks every second
+while playing (position updates) and less often otherwise. `notify()` makes
+it read right away, e.g. after a control command or an MPRIS signal.
+"""
+
+import asyncio
+import contextlib
+import json
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+PLAYING_INTERVAL = 1.0  # seconds between reads while playing
+IDLE_INTERVAL = 5.0  # seconds between reads otherwise
+KEEPALIVE = 15.0  # seconds of silence before a comment line keeps proxies from closing the stream
+QUEUE_SIZE = 32  # events buffered per subscriber before it is resynced with a snapshot
+
+
+class PlayerEventHub:
+    def __init__(self, read_state: Callable[[], Awaitable[dict]]):
+        self.read_state = read_state
+        self.state: Optional[dict] = None
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self):
+        """Read the state now instead of at the next tick. Safe to call from any thread."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _publish(self, event: str, data: Optional[dict]):
+        for queue in self._subscribers:
+            if queue.full():
+                # Slow client: drop what it hasn't read and resync it from the current state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", self.state))
+            else:
+                queue.put_nowait((event, data))
+
+    async def _poll(self):
+        while self._subscribers:
+            try:
+                state = await self.read_state()
+            except Exception as e:
+                print(f"⚠️ Player state read failed: {e}")
+                state = self.state
+            if state is not None and state != self.state:
+                previous, self.state = self.state, state
+                if previous is None:
+                    self._publish("snapshot", state)
+                else:
+                    self._publish("update", {k: v for k, v in state.items() if previous.get(k) != v})
+
+            playing = bool(state) and state.get("status") == "playing" and not state.get("is_paused")
+            interval = PLAYING_INTERVAL if playing else IDLE_INTERVAL
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), interval)
+            self._wake.clear()
+        # Nobody is watching, so the state would go stale
+        self.state = None
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """
+        Yield a queue of (event, data) tuples: a `snapshot` with the full state,
+        then `update`s with only the changed fields. `(None, None)` means the
+        hub closed.
+        """
+        queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        if self.state is not None:
+            queue.put_nowait(("snapshot", self.state))
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._poll())
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """The subscription as server-sent events."""
+        async with self.subscribe() as queue:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def close(self):
+        """End every stream and stop the poller (call on shutdown)."""
+        for queue in self._subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((None, None))
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -0,0 +1,137 @@
+"""
+Full-text search over every song store: the local library index, the synced
+Spotify liked songs and the user's liked_songs list.
+
+Rows are copied into SQLite FTS5 tables (one word-based with prefix indexes,
+one trigram-based for fuzzy/substring fallback) so a search-as-you-type
+request is a single indexed query.
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Optional
+
+from constants import SEARCH_INDEX_DB_PATH, LIBRARY_DB_PATH, SPOTIFY_DB_PATH, LIKED_SONGS_DB_PATH
+
+# source name -> (database, SELECT producing title, artist, album, ref, url)
+SOURCES = {
+    "local": (LIBRARY_DB_PATH, "SELECT title, artist, album, path, path FROM src.tracks"),
+    "spotify": (SPOTIFY_DB_PATH, "SELECT name, artist, NULL, id, spotify_url FROM src.liked_songs"),
+    "liked": (LIKED_SONGS_DB_PATH, "SELECT song_name, artist, NULL, id, url FROM src.liked_songs"),
+}
+
+# bm25 column weights: title, artist, album
+RANK = "bm25({table}, 10.0, 5.0, 2.0)"
+
+
+def _prefix_terms(query: str) -> str:
+    """Quote each word so user input can't inject FTS syntax, and prefix-match it."""
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+", query))
+
+
+class SearchIndex:
+    def __init__(self, db_path: str = SEARCH_INDEX_DB_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # uri=True so sources can be attached read-only
+        return sqlite3.connect(self.db_path, uri=True)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+                title, artist, album,
+                source UNINDEXED, ref UNINDEXED, url UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '1 2 3'
+            )
+        """)
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS songs_fuzzy USING fts5(
+                title, artist, album,
+                source UNINDEXED, ref UNINDEXED, url UNINDEXED,
+                tokenize = 'trigram'
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def refresh(self, source: str):
+        """Re-copy one source's rows into both FTS tables in a single transaction."""
+        db_path, select = SOURCES[source]
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                conn.execute("ATTACH DATABASE ? AS src", (f"file:{db_path}?mode=ro",))
+            except sqlite3.OperationalError:
+                # Source database doesn't exist yet
+                conn.close()
+                return
+            try:
+                rows = conn.execute(select).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Search index: cannot read {source}: {e}")
+                rows = []
+            with conn:
+                for table in ("songs_fts", "songs_fuzzy"):
+                    conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+                    conn.executemany(
+                        f"INSERT INTO {table} (title, artist, album, source, ref, url) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(title, artist, album, source, ref, url) for title, artist, album, ref, url in rows]
+                    )
+            conn.close()
+            print(f"🔎 Search index: {len(rows)} {source} songs indexed")
+
+    def refresh_in_background(self, *sources: str):
+        def run():
+            for source in sources or SOURCES:
+                try:
+                    self.refresh(source)
+                except Exception as e:
+                    print(f"⚠️ Search index refresh failed for {source}: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def search(self, query: str, limit: int = 20, sources: Optional[list[str]] = None,
+               fuzzy: bool = True) -> list[dict]:
+        """
+        Prefix-match every word (ranked by bm25, title weighted highest).
+        Falls back to trigram matching when nothing matches, so typos and partial
+        words still find the closest titles. Pass `fuzzy=False` where a loose
+        match would be wrong, e.g. picking a song to play.
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        source_sql = ""
+        source_params: list = []
+        if sources:
+            source_sql = f" AND source IN ({', '.join('?' * len(sources))})"
+            source_params = list(sources)
+
+        rows = []
+        terms = _prefix_terms(query)
+        if terms:
+            rows = conn.execute(
+                f"SELECT title, artist, album, source, ref, url FROM songs_fts "
+                f"WHERE songs_fts MATCH ?{source_sql} ORDER BY {RANK.format(table='songs_fts')} LIMIT ?",
+                [terms, *source_params, limit]
+            ).fetchall()
+
+        trigrams = {
+            w[i:i + 3].lower()
+            for w in re.findall(r"\w+", query)
+            for i in range(len(w) - 2)
+        }
+        if fuzzy and not rows and trigrams:
+            # Rows sharing more trigrams with the query rank higher
+            fuzzy_terms = " OR ".join(f'"{t}"' for t in sorted(trigrams))
+            rows = conn.execute(
+                f"SELECT title, artist, album, source, ref, url FROM songs_fuzzy "
+                f"WHERE songs_fuzzy MATCH ?{source_sql} ORDER BY {RANK.format(table='songs_fuzzy')} LIMIT ?",
+                [fuzzy_terms, *source_params, limit]
+            ).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
@@ -0,0 +1,133 @@
+"""
+Typed, cached view of config.yaml.
+
+`config_store.get()` returns an immutable Config. The file is only re-read
+when its mtime changes (checked at most once per CHECK_INTERVAL), so request
+paths don't do YAML parsing, and edits such as switching control_mode take
+effect without a restart. An edit that fails validation is reported and the
+previous config stays in effect.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, fields, asdict
+from typing import Callable, Optional
+
+import yaml
+
+from constants import CONFIG_PATH
+
+CHECK_INTERVAL = 1.0  # seconds between mtime checks
+
+CONTROL_MODES = ("mpris", "mpv")
+SPOTIFY_MODES = ("ytdlp", "sp_client")
+STREAM_MODES = ("ytdl", "direct")
+
+
+class ConfigError(ValueError):
+    """config.yaml is missing, unreadable or has invalid values."""
+
+
+@dataclass(frozen=True)
+class Config:
+    spotify_client_id: str = ""
+    spotify_client_secret: str = ""
+    spotify_redirect_uri: str = ""
+    control_mode: str = "mpris"
+    spotify_mode: str = "sp_client"
+    stream_mode: str = "ytdl"
+    download_workers: int = 3
+    spotdl_workers: int = 2
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "Config":
+        data = data or {}
+        if not isinstance(data, dict):
+            raise ConfigError("config.yaml must be a mapping of settings")
+        known = {f.name: f for f in fields(cls)}
+        values = {}
+        for key, value in data.items():
+            if key not in known:
+                print(f"⚠️ Ignoring unknown config key: {key}")
+                continue
+            if known[key].type is int:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    raise ConfigError(f"{key} must be an integer, got {value!r}")
+                if value < 1:
+                    raise ConfigError(f"{key} must be at least 1")
+            elif value is not None:
+                value = str(value)
+            values[key] = value if value is not None else known[key].default
+        config = cls(**values)
+        for key, allowed in (("control_mode", CONTROL_MODES), ("spotify_mode", SPOTIFY_MODES), ("stream_mode", STREAM_MODES)):
+            if getattr(config, key) not in allowed:
+                raise ConfigError(f"{key} must be one of: {', '.join(allowed)}")
+        return config
+
+    @property
+    def spotify_configured(self) -> bool:
+        return bool(self.spotify_client_id and self.spotify_client_secret and self.spotify_redirect_uri)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ConfigStore:
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._config: Optional[Config] = None
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[Config, Config], None]] = []
+
+    def on_change(self, listener: Callable[[Config, Config], None]):
+        """Call `listener(old, new)` whenever a reload changes the config."""
+        self._listeners.append(listener)
+
+    def _read(self) -> Config:
+        try:
+            with open(self.path, "r") as f:
+                data = yaml.safe_load(f)
+        except (OSError, yaml.YAMLError) as e:
+            raise ConfigError(f"Cannot read {self.path}: {e}")
+        return Config.from_dict(data)
+
+    def get(self) -> Config:
+        now = time.monotonic()
+        if self._config is not None and now - self._checked_at < CHECK_INTERVAL:
+            return self._config
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._config is None:
+                    raise ConfigError(f"Cannot read {self.path}: {e}")
+                return self._config
+            if mtime == self._mtime:
+                return self._config
+
+            old = self._config
+            try:
+                new = self._read()
+            except ConfigError as e:
+                if old is None:
+                    raise
+                print(f"⚠️ config.yaml changed but is invalid, keeping the previous config: {e}")
+                self._mtime = mtime
+                return old
+            self._config, self._mtime = new, mtime
+
+        if old is not None and new != old:
+            print("🔧 config.yaml reloaded")
+            for listener in self._listeners:
+                listener(old, new)
+        return new
+
+
+config_store = ConfigStore()
@@ -0,0 +1,127 @@
+"""
+Bounded runner for spotdl downloads.
+
+Spotify URLs become jobs in the shared registry (so /downloads covers them
+alongside YouTube downloads). A fixed number of workers run spotdl, whose
+output is streamed line by line into the job. Playlist and album URLs are
+expanded into one job per track, so tracks are deduplicated, retried and
+cancelled individually.
+"""
+
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+
+from functions import download_key, extract_spotify_id
+from jobs import DownloadJob, JobRegistry, JobRunner, PermanentJobError, job_registry
+
+DEFAULT_WORKERS = 2
+LIST_TIMEOUT = 5 * 60  # seconds to list a playlist/album's tracks
+
+# e.g. Downloaded "Artist - Title": https://music.youtube.com/watch?v=...
+DOWNLOADED_LINE = re.compile(r'Downloaded "(.+?)"')
+
+
+class SpotDLRunner(JobRunner):
+    source = "spotify"
+
+    def __init__(self, music_dir: str, workers: int = DEFAULT_WORKERS, registry: JobRegistry = job_registry):
+        self.music_dir = Path(music_dir)
+        super().__init__(workers, registry)
+
+    def _command(self, *args) -> list[str]:
+        # If you use 'uv tool run spotdl', set this:
+        # cmd = ["uv", "tool", "run", "spotdl"]
+        # If you use spotdl directly, set this:
+        cmd = ["spotdl"]
+        if not shutil.which(cmd[0]):
+            raise PermanentJobError("spotdl is not found in PATH. Make sure spotdl is installed.")
+        return [*cmd, *args]
+
+    def add_to_queue(self, url: str, parent_id: str = None) -> tuple[DownloadJob, bool]:
+        spotify_id = extract_spotify_id(url)
+        if spotify_id and spotify_id[0] != "track":
+            # Playlists change over time; their tracks are deduplicated individually instead
+            return self.enqueue(url, parent_id=parent_id)
+        return self.enqueue(url, media_key=download_key(url), parent_id=parent_id)
+
+    def run(self, job: DownloadJob) -> dict:
+        spotify_id = extract_spotify_id(job.url)
+        if spotify_id and spotify_id[0] in ("playlist", "album"):
+            return self._expand(job)
+        return self._download(job)
+
+    def _expand(self, job: DownloadJob) -> dict:
+        """Queue one job per track of a playlist or album."""
+        self.registry.update(job.id, detail="Listing tracks...")
+        track_urls = self._list_tracks(job.url)
+        if job.cancelled:
+            # Cancelled while listing; don't queue tracks the cancel couldn't reach
+            raise RuntimeError(f"Cancelled: {job.url}")
+        created = sum(self.add_to_queue(url, parent_id=job.id)[1] for url in track_urls)
+        print(f"📋 Expanded {job.url}: {len(track_urls)} tracks, {created} new")
+        return {"detail": f"{created} of {len(track_urls)} tracks queued"}
+
+    def _list_tracks(self, url: str) -> list[str]:
+        with tempfile.TemporaryDirectory() as tmp:
+            save_file = os.path.join(tmp, "tracks.spotdl")
+            result = subprocess.run(
+                self._command("save", url, "--save-file", save_file),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=LIST_TIMEOUT
+            )
+            if result.returncode != 0 or not os.path.exists(save_file):
+                raise RuntimeError(f"spotdl could not list {url}: {result.stdout.strip()[-500:]}")
+            with open(save_file) as f:
+                songs = json.load(f)
+        return [song["url"] for song in songs if song.get("url")]
+
+    def _download(self, job: DownloadJob) -> dict:
+        proc = subprocess.Popen(
+            self._command(job.url, "--output", str(self.music_dir)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        )
+        tail = deque(maxlen=20)
+        downloaded = []
+
+        def read_output():
+            for line in proc.stdout:
+                line = line.strip()
+                if not line:
+                    continue
+                tail.append(line)
+                match = DOWNLOADED_LINE.search(line)
+                if match:
+                    downloaded.append(match.group(1))
+                self.registry.update(job.id, detail=line)
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+        while proc.poll() is None:
+            if job.cancel_event.wait(0.5):
+                proc.terminate()
+                break
+        proc.wait()
+        reader.join()
+
+        if proc.returncode != 0:
+            raise RuntimeError("\n".join(tail) or f"spotdl exited with {proc.returncode}")
+
+        filename = None
+        if downloaded:
+            # spotdl's default output template is "{artists} - {title}.{output-ext}"
+            candidates = sorted(self.music_dir.glob(f"{glob.escape(downloaded[-1])}.*"))
+            filename = str(candidates[0]) if candidates else None
+        return {"filename": filename}
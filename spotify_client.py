@@ -0,0 +1,171 @@
+"""
+Process-wide Spotify client.
+
+One spotipy client and one pooled HTTP session are shared by every request.
+The token is kept in memory and refreshed by a background thread shortly
+before it expires; refreshes are serialized, so concurrent requests never
+race to refresh it or pay for it inline.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+import spotipy
+import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from spotipy.oauth2 import SpotifyOAuth
+
+from constants import AUTH_PATH, SPOTIFY_SCOPES
+from settings import Config
+
+REFRESH_MARGIN = 5 * 60  # refresh this many seconds before the token expires
+REFRESH_RETRY = 30  # seconds between attempts after a failed refresh
+HTTP_POOL_SIZE = 10
+# 429s are left to functions.spotify_call, so the Retry-After pause is shared by all threads
+RETRY_STATUSES = (500, 502, 503, 504)
+HTTP_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled after each retry
+
+
+class SpotifyNotAuthenticated(Exception):
+    """No Spotify token has been saved yet; the user needs to visit /setup."""
+
+
+class SpotifyClientManager:
+    def __init__(self, config_loader: Callable[[], Config], auth_path: str = AUTH_PATH):
+        self.config_loader = config_loader
+        self.auth_path = auth_path
+        self._token: Optional[dict] = None
+        self._oauth: Optional[SpotifyOAuth] = None
+        self._client: Optional[spotipy.Spotify] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._token_changed = threading.Event()
+
+        self.session = requests.Session()
+        # spotipy only adds its own retries when it builds the session, so they live on our adapter
+        retry = Retry(
+            total=HTTP_RETRIES,
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=RETRY_BACKOFF,
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+            raise_on_status=False,  # let spotipy turn the last response into a SpotifyException
+            # Otherwise urllib3 retries any 429 carrying Retry-After itself, per thread,
+            # before functions.spotify_call can pause the shared rate limiter
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        self.session.mount("https://", adapter)
+
+    # ------------------------------ oauth ------------------------------ #
+
+    def oauth(self) -> SpotifyOAuth:
+        """SpotifyOAuth for the configured app. Raises ValueError if config.yaml lacks the credentials."""
+        if self._oauth is None:
+            config = self.config_loader()
+            if not config.spotify_configured:
+                raise ValueError("Spotify configuration is missing or incomplete in config.yaml.")
+            self._oauth = SpotifyOAuth(
+                client_id=config.spotify_client_id,
+                client_secret=config.spotify_client_secret,
+                redirect_uri=config.spotify_redirect_uri,
+                scope=SPOTIFY_SCOPES,
+                cache_path=self.auth_path,
+                requests_session=self.session
+            )
+        return self._oauth
+
+    def reset_oauth(self):
+        """Forget the cached SpotifyOAuth, e.g. after the app credentials changed."""
+        self._oauth = None
+
+    def on_config_change(self, old: Config, new: Config):
+        if (old.spotify_client_id, old.spotify_client_secret, old.spotify_redirect_uri) != \
+                (new.spotify_client_id, new.spotify_client_secret, new.spotify_redirect_uri):
+            self.reset_oauth()
+
+    # ------------------------------ token ------------------------------ #
+
+    def _load_token(self) -> Optional[dict]:
+        if self._token is None and os.path.exists(self.auth_path):
+            with open(self.auth_path, "r") as f:
+                self._token = yaml.safe_load(f)
+        return self._token
+
+    def set_token(self, token_info: dict):
+        """Store a token obtained from the OAuth callback."""
+        with self._lock:
+            with open(self.auth_path, "w") as f:
+                yaml.safe_dump(token_info, f)
+            self._token = token_info
+        self._token_changed.set()
+
+    @property
+    def authenticated(self) -> bool:
+        token = self._load_token()
+        return bool(token and "access_token" in token)
+
+    def _expires_in(self) -> float:
+        token = self._load_token()
+        return token.get("expires_at", 0) - time.time() if token else 0
+
+    def _refresh(self, margin: float = REFRESH_MARGIN):
+        """Refresh the token unless another thread already did."""
+        with self._lock:
+            if self._expires_in() > margin:
+                return
+            token = self._load_token()
+            if not token or "refresh_token" not in token:
+                raise SpotifyNotAuthenticated("Spotify is not authenticated. Please visit /setup.")
+            token_info = self.oauth().refresh_access_token(token["refresh_token"])
+            # Spotify doesn't always return a new refresh token
+            token_info.setdefault("refresh_token", token["refresh_token"])
+            with open(self.auth_path, "w") as f:
+                yaml.safe_dump(token_info, f)
+            self._token = token_info
+            print("🔑 Spotify token refreshed")
+
+    def get_access_token(self, as_dict: bool = False):
+        """spotipy auth-manager hook, called before each API request."""
+        if not self.authenticated:
+            raise SpotifyNotAuthenticated("Spotify is not authenticated. Please visit /setup.")
+        if self._expires_in() <= 0:
+            # Only if the background refresh fell behind (e.g. right after a suspend)
+            self._refresh(margin=0)
+        return self._token if as_dict else self._token["access_token"]
+
+    # ------------------------------ client ------------------------------ #
+
+    def client(self) -> spotipy.Spotify:
+        """The shared spotipy client. Raises SpotifyNotAuthenticated."""
+        if not self.authenticated:
+            raise SpotifyNotAuthenticated("Spotify is not authenticated. Please visit /setup.")
+        if self._client is None:
+            self._client = spotipy.Spotify(auth_manager=self, requests_session=self.session)
+        return self._client
+
+    def start(self):
+        """Keep the token fresh on a daemon thread until `stop()`."""
+        def loop():
+            while not self._stop.is_set():
+                wait = REFRESH_RETRY
+                if self.authenticated:
+                    try:
+                        self._refresh()
+                        wait = max(self._expires_in() - REFRESH_MARGIN, REFRESH_RETRY)
+                    except Exception as e:
+                        print(f"⚠️ Spotify token refresh failed: {e}")
+                else:
+                    wait = None  # nothing to refresh until the user authenticates
+                self._token_changed.wait(wait)
+                self._token_changed.clear()
+        self._stop.clear()
+        threading.Thread(target=loop, name="spotify-token-refresh", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._token_changed.set()